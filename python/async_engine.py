@@ -0,0 +1,224 @@
+"""Background asyncio engine that runs /test_api jobs without holding a Flask worker"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def available():
+    return aiohttp is not None
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class AsyncResponse:
+    """The parts of a requests.Response that result decoding relies on"""
+
+    def __init__(self, status_code, headers, content, encoding=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Job:
+    """One submitted unit of work and, once finished, its result or error"""
+
+    def __init__(self, kind, description):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.future = None
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def to_dict(self, include_result=True):
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'description': self.description,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'progress': dict(self.progress),
+        }
+        if self.started_at:
+            data['elapsed_s'] = round((self.finished_at or time.time()) - self.started_at, 3)
+        if include_result:
+            data['result'] = self.result
+            data['error'] = self.error
+        return data
+
+
+class AsyncEngine:
+    """An event loop on a daemon thread with one shared aiohttp session.
+
+    Flask handlers submit coroutine functions and get a Job back at once;
+    the coroutines run on the engine's loop, so thousands of requests can be
+    in flight on one core and no Flask worker waits on a slow target.
+    Finished jobs are kept for lookup, oldest evicted past ``job_history``.
+    """
+
+    def __init__(self, max_connections=1000, job_history=200):
+        self.max_connections = max_connections
+        self.job_history = job_history
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._session = None
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            if aiohttp is None:
+                raise RuntimeError('Async engine not available (pip install aiohttp)')
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='async-engine', daemon=True).start()
+            self._loop = loop
+            asyncio.run_coroutine_threadsafe(self._open_session(), loop).result()
+
+    async def _open_session(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_dns_resolvehost_start.append(self._on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(self._on_dns_end)
+        trace_config.on_connection_create_start.append(self._on_connect_start)
+        trace_config.on_connection_create_end.append(self._on_connect_end)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=0),
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[trace_config],
+        )
+
+    # Trace hooks fill the timing dict passed as trace_request_ctx, if any
+
+    async def _on_dns_start(self, session, context, params):
+        if isinstance(context.trace_request_ctx, dict):
+            context.trace_request_ctx['_dns_started'] = time.perf_counter()
+
+    async def _on_dns_end(self, session, context, params):
+        timing = context.trace_request_ctx
+        if isinstance(timing, dict) and '_dns_started' in timing:
+            timing['dns_ms'] = _ms(time.perf_counter() - timing.pop('_dns_started'))
+
+    async def _on_connect_start(self, session, context, params):
+        if isinstance(context.trace_request_ctx, dict):
+            context.trace_request_ctx['_connect_started'] = time.perf_counter()
+
+    async def _on_connect_end(self, session, context, params):
+        timing = context.trace_request_ctx
+        if isinstance(timing, dict) and '_connect_started' in timing:
+            timing['connect_ms'] = _ms(time.perf_counter() - timing.pop('_connect_started'))
+            timing['connection_reused'] = False
+
+    async def timed_request(self, method, url, headers=None, data=None, timeout=30):
+        """Send one request on the shared session; returns (AsyncResponse, timing)"""
+        timing = {'dns_ms': 0.0, 'connect_ms': 0.0, 'connection_reused': True}
+        started = time.perf_counter()
+        async with self._session.request(method, url, headers=headers, data=data,
+                                         timeout=aiohttp.ClientTimeout(total=timeout),
+                                         trace_request_ctx=timing) as response:
+            headers_received = time.perf_counter()
+            content = await response.read()
+            finished = time.perf_counter()
+            response_headers = CaseInsensitiveDict(response.headers)
+            result = AsyncResponse(response.status, response_headers, content, response.charset)
+        timing['time_to_first_byte_ms'] = round(max(_ms(headers_received - started) - timing['connect_ms'], 0.0), 3)
+        timing['body_download_ms'] = _ms(finished - headers_received)
+        timing['total_ms'] = _ms(finished - started)
+        return result, timing
+
+    async def send(self, method, url, headers=None, data=None, timeout=30):
+        """Send one request and return only its status code (for load runs)"""
+        async with self._session.request(method, url, headers=headers, data=data,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            await response.read()
+            return response.status
+
+    def submit(self, kind, description, coroutine_function, *args):
+        """Run ``coroutine_function(job, *args)`` on the engine; returns the Job"""
+        self._ensure_started()
+        job = Job(kind, description)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._evict()
+        job.future = asyncio.run_coroutine_threadsafe(self._run(job, coroutine_function, args), self._loop)
+        job.future.add_done_callback(lambda future: self._on_future_done(job, future))
+        return job
+
+    @staticmethod
+    def _on_future_done(job, future):
+        # A job cancelled before it started never reaches _run's handlers
+        if future.cancelled() and not job.done:
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+
+    async def _run(self, job, coroutine_function, args):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = await coroutine_function(job, *args)
+            job.status = 'succeeded'
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - self.job_history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._jobs_lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job.future.cancel()
+        return job
+
+    def close(self):
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import async_engine
+import loadtest
+
+pytestmark = pytest.mark.skipif(not async_engine.available(), reason='aiohttp not installed')
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/slow':
+            time.sleep(0.5)
+        reply = json.dumps({'received': len(body)}).encode()
+        try:
+            self.send_response(201)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on /slow (cancelled job)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine():
+    engine = async_engine.AsyncEngine(max_connections=50)
+    yield engine
+    engine.close()
+
+
+def wait_for(job, timeout=10):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_timed_request_job_returns_response_and_timing(engine, server_url):
+    async def fetch(job):
+        first, _ = await engine.timed_request('POST', f'{server_url}/echo', data=b'abc')
+        second, timing = await engine.timed_request('POST', f'{server_url}/echo', data=b'abcdef')
+        return first.json(), second.headers['content-type'], timing
+
+    job = wait_for(engine.submit('single', {}, fetch))
+    assert job.status == 'succeeded'
+    first, content_type, timing = job.result
+    assert first == {'received': 3}
+    assert content_type == 'application/json'
+    assert timing['connection_reused'] is True
+    assert timing['total_ms'] > 0
+
+
+def test_load_job_runs_all_requests_in_one_loop(engine, server_url):
+    async def load(job):
+        async def send():
+            return await engine.send('POST', f'{server_url}/echo', data=b'x')
+        return await loadtest.run_load_test_async(send, total_requests=100, concurrency=20,
+                                                  progress=lambda done: job.progress.update(completed=done))
+
+    job = wait_for(engine.submit('load', {}, load))
+    assert job.result['status_counts'] == {'201': 100}
+    assert job.progress['completed'] == 100
+
+
+def test_cancel_stops_a_running_job_and_unknown_jobs_are_none(engine, server_url):
+    async def slow(job):
+        await engine.send('POST', f'{server_url}/slow', data=b'x')
+
+    job = engine.submit('single', {}, slow)
+    time.sleep(0.1)
+    engine.cancel(job.id)
+    assert wait_for(job).status == 'cancelled'
+    assert engine.get('missing') is None
+    assert [listed.id for listed in engine.list_jobs()] == [job.id]
@@ -0,0 +1,108 @@
+"""Cost of recording metrics: per-thread cells vs. a shared lock, and per /api/users request.
+
+Run from the python/ directory:
+
+    python benchmarks/bench_metrics.py [--ops 200000] [--threads 1 8] [--requests 4000]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from protobuf_with_test_data import app, sample_users
+
+
+class LockedCounter:
+    """The obvious alternative: one value behind one lock"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+def ns_per_op(thread_count, total, work):
+    """Split ``total`` calls of ``work()`` over threads; returns wall ns per call"""
+    per_thread = total // thread_count
+    barrier = threading.Barrier(thread_count + 1)
+
+    def runner():
+        barrier.wait()
+        for _ in range(per_thread):
+            work()
+
+    threads = [threading.Thread(target=runner) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - started) / (per_thread * thread_count) * 1e9
+
+
+def requests_per_second(total, instrumented):
+    """GET /api/users through the test client, with or without the metric hooks"""
+    hooks = (app.before_request_funcs, app.after_request_funcs, app.teardown_request_funcs)
+    saved = [dict(functions) for functions in hooks]
+    if not instrumented:
+        for functions in hooks:
+            functions.clear()
+    try:
+        client = app.test_client()
+        started = time.perf_counter()
+        for _ in range(total):
+            client.get('/api/users')
+        return total / (time.perf_counter() - started)
+    finally:
+        for functions, original in zip(hooks, saved):
+            functions.clear()
+            functions.update(original)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=200000, help='recordings per micro-benchmark')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=4000, help='GETs per endpoint run')
+    args = parser.parse_args()
+
+    registry = metrics.Registry()
+    counter = registry.counter('bench_total', 'Bench', ('route',))
+    child = counter.labels('/api/users')
+    histogram = registry.histogram('bench_seconds', 'Bench').labels()
+    locked = LockedCounter()
+    cases = {
+        'locked counter': locked.inc,
+        'counter child': child.inc,
+        'counter labels()': lambda: counter.labels('/api/users').inc(),
+        'histogram observe': lambda: histogram.observe(0.003),
+    }
+
+    print(f"{'threads':>8} " + ' '.join(f'{name:>18}' for name in cases) + '   (ns/op)')
+    for thread_count in args.threads:
+        costs = [ns_per_op(thread_count, args.ops, work) for work in cases.values()]
+        print(f'{thread_count:>8} ' + ' '.join(f'{cost:>18,.0f}' for cost in costs))
+
+    sample_users.clear()
+    requests_per_second(args.requests // 4, instrumented=True)  # warm-up
+    # Alternate and keep the best of three, so drift does not favour either side
+    rates = {False: 0.0, True: 0.0}
+    for _ in range(3):
+        for hooked in rates:
+            rates[hooked] = max(rates[hooked], requests_per_second(args.requests, hooked))
+    plain, instrumented = rates[False], rates[True]
+    overhead_us = (1 / instrumented - 1 / plain) * 1e6
+    print(f'GET /api/users: {plain:,.0f} req/s without hooks, {instrumented:,.0f} req/s with '
+          f'({overhead_us:.1f} us per request)')
+
+
+if __name__ == '__main__':
+    main()
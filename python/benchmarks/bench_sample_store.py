@@ -0,0 +1,83 @@
+"""Throughput of concurrent creates against the sample store and /api/users.
+
+Run from the python/ directory:
+
+    python benchmarks/bench_sample_store.py [--requests 20000] [--threads 1 8 32]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protobuf_with_test_data import app, sample_users, protobuf_service
+from sample_store import SampleStore
+
+
+def run_threads(thread_count, total, work):
+    """Split ``total`` calls of ``work(i)`` over threads; returns ops/second"""
+    per_thread = total // thread_count
+    barrier = threading.Barrier(thread_count + 1)
+
+    def runner():
+        barrier.wait()
+        for i in range(per_thread):
+            work(i)
+
+    threads = [threading.Thread(target=runner) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return per_thread * thread_count / (time.perf_counter() - started)
+
+
+def bench_store(thread_count, total):
+    store = SampleStore('user')
+    rate = run_threads(thread_count, total, lambda i: store.add({'name': 'bench', 'age': i}))
+    assert len(store) == len(store.to_dict()) == total // thread_count * thread_count
+    return rate
+
+
+def bench_endpoint(thread_count, total, protocol):
+    sample_users.clear()
+    local = threading.local()
+    if protocol == 'protobuf':
+        module, _ = protobuf_service.load_proto_module('sample.proto')
+        body = module.UserRequest(name='bench', age=30, tags=['a', 'b']).SerializeToString()
+        kwargs = {'data': body, 'headers': {'Content-Type': 'application/x-protobuf'}}
+    else:
+        kwargs = {'json': {'name': 'bench', 'age': 30, 'tags': ['a', 'b']}}
+
+    def post(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        assert local.client.post('/api/users', **kwargs).status_code == 201
+
+    rate = run_threads(thread_count, total, post)
+    ids = sample_users.to_dict()
+    assert len(ids) == total // thread_count * thread_count, 'duplicate or lost ids'
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000, help='creates per store run')
+    parser.add_argument('--endpoint-requests', type=int, default=4000, help='POSTs per endpoint run')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'store ops/s':>14} {'POST json/s':>14} {'POST protobuf/s':>16}")
+    for thread_count in args.threads:
+        store_rate = bench_store(thread_count, args.requests)
+        json_rate = bench_endpoint(thread_count, args.endpoint_requests, 'json')
+        proto_rate = bench_endpoint(thread_count, args.endpoint_requests, 'protobuf')
+        print(f'{thread_count:>8} {store_rate:>14,.0f} {json_rate:>14,.0f} {proto_rate:>16,.0f}')
+
+
+if __name__ == '__main__':
+    main()
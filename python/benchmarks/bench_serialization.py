@@ -0,0 +1,162 @@
+"""Encode/decode throughput and allocations of protobuf binary, JSON and dict paths.
+
+Covers the conversions the service makes: SerializeToString / FromString for
+protobuf bodies, MessageToJson / Parse for JSON bodies, MessageToDict /
+ParseDict for results, and Parse(json.dumps(...)) as /test_api once did with
+custom_data. Messages come from sample.proto at several sizes.
+
+Run from the python/ directory:
+
+    python benchmarks/bench_serialization.py [--seconds 0.3] [--save results.json] [--compare baseline.json]
+
+With --compare, paths slower than the baseline by more than --tolerance
+(ops/second) are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.protobuf.json_format import MessageToDict, MessageToJson, Parse, ParseDict
+from protobuf_with_test_data import protobuf_service
+
+
+def user_request(module, tags, text):
+    return module.UserRequest(name='n' * text, age=42, email=f"{'e' * text}@example.com", active=True,
+                              tags=[f'tag-{index}' for index in range(tags)])
+
+
+def product_response(module, tags, text):
+    # ProductResponse has no repeated field; size grows with the nested strings only
+    return module.ProductResponse(
+        product_id='p' * text, status='created', total_value=1234.5,
+        product=module.ProductRequest(product_name='x' * text, price=19.99, quantity=7, category='c' * text))
+
+
+# name -> (builder, {size: (tags, text length)})
+MESSAGES = {
+    'UserRequest': (user_request, {'small': (2, 8), 'medium': (50, 64), 'large': (1000, 1024)}),
+    'ProductResponse': (product_response, {'small': (0, 8), 'medium': (0, 256), 'large': (0, 16384)}),
+}
+
+
+def paths(message):
+    """path name -> zero-argument function exercising it on ``message``"""
+    message_class = type(message)
+    binary = message.SerializeToString()
+    text = MessageToJson(message)
+    data = MessageToDict(message)
+    return {
+        'encode binary': message.SerializeToString,
+        'encode MessageToJson': lambda: MessageToJson(message),
+        'encode MessageToJson indent=None': lambda: MessageToJson(message, indent=None),
+        'encode MessageToDict': lambda: MessageToDict(message),
+        'encode json.dumps(MessageToDict)': lambda: json.dumps(MessageToDict(message)),
+        'decode binary': lambda: message_class.FromString(binary),
+        'decode Parse': lambda: Parse(text, message_class()),
+        'decode ParseDict': lambda: ParseDict(data, message_class()),
+        'decode Parse(json.dumps(dict))': lambda: Parse(json.dumps(data), message_class()),
+    }
+
+
+def ops_per_second(function, seconds):
+    """Calls per second over at least ``seconds``, in batches to keep timer overhead out"""
+    batch = 1
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            function()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return calls / elapsed
+        batch = min(batch * 2, 10000)
+
+
+def peak_bytes(function, repeat=5):
+    """Peak Python-heap bytes allocated by one call (upb's own arenas are not traced)"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = function()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            del result
+    finally:
+        tracemalloc.stop()
+    return min(peaks)
+
+
+def run(seconds):
+    module, error = protobuf_service.load_proto_module('sample.proto')
+    if error:
+        sys.exit(error)
+    results = []
+    for message_name, (build, sizes) in MESSAGES.items():
+        for size, (tags, text) in sizes.items():
+            message = build(module, tags, text)
+            for path, function in paths(message).items():
+                function()  # warm-up
+                results.append({
+                    'message': message_name,
+                    'size': size,
+                    'binary_bytes': message.ByteSize(),
+                    'path': path,
+                    'ops_per_second': ops_per_second(function, seconds),
+                    'peak_bytes': peak_bytes(function),
+                })
+    return results
+
+
+def print_results(results):
+    print(f"{'message':>16} {'size':>7} {'bytes':>7} {'path':>34} {'ops/s':>12} {'MB/s':>8} {'peak B/op':>10}")
+    for result in results:
+        megabytes = result['ops_per_second'] * result['binary_bytes'] / 1e6
+        print(f"{result['message']:>16} {result['size']:>7} {result['binary_bytes']:>7} {result['path']:>34} "
+              f"{result['ops_per_second']:>12,.0f} {megabytes:>8.1f} {result['peak_bytes']:>10,}")
+
+
+def regressions(results, baseline, tolerance):
+    """Paths whose ops/second fell more than ``tolerance`` (a fraction) below the baseline"""
+    previous = {(result['message'], result['size'], result['path']): result['ops_per_second'] for result in baseline}
+    slower = []
+    for result in results:
+        before = previous.get((result['message'], result['size'], result['path']))
+        if before and result['ops_per_second'] < before * (1 - tolerance):
+            slower.append(f"{result['message']} {result['size']} {result['path']}: "
+                          f"{before:,.0f} -> {result['ops_per_second']:,.0f} ops/s")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=0.3, help='minimum run time per path and size')
+    parser.add_argument('--save', help='write the results as JSON, e.g. to use as a baseline')
+    parser.add_argument('--compare', help='baseline JSON written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed ops/s drop vs. the baseline')
+    args = parser.parse_args()
+
+    results = run(args.seconds)
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        if slower:
+            print(f'\n{len(slower)} regression(s) beyond {args.tolerance:.0%}:')
+            print('\n'.join(slower))
+            sys.exit(1)
+        print(f'\nNo regressions beyond {args.tolerance:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Requests/second of the sample APIs under each serving mode of serve.py.
+
+Starts the service once per configuration, drives POST /api/users (JSON and
+protobuf) and GET /api/users?limit=10 at a fixed concurrency, then stops it.
+Configurations are ``dev``, ``threaded`` or ``gunicorn:<workers>x<threads>``.
+
+Run from the python/ directory:
+
+    python benchmarks/bench_serving.py [--requests 3000] [--concurrency 32] [--configs threaded gunicorn:2x4]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loadtest
+import requests
+from protobuf_with_test_data import protobuf_service
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Deduplicated: on one CPU the last two are the same
+DEFAULT_CONFIGS = list(dict.fromkeys(['dev', 'threaded', 'gunicorn:1x4', f'gunicorn:{os.cpu_count()}x4']))
+
+
+def start_server(config, port):
+    if config.startswith('gunicorn:'):
+        workers, threads = config.split(':', 1)[1].split('x')
+        args = ['--mode', 'gunicorn', '--workers', workers, '--threads', threads]
+    else:
+        args = ['--mode', config]
+    # Own session, so the dev reloader's child process is stopped along with it
+    process = subprocess.Popen([sys.executable, 'serve.py', '--port', str(port), *args], cwd=PYTHON_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/users?limit=1', timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    stop_server(process)
+    sys.exit(f'{config} did not start on port {port}')
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def drive(method, url, headers, body, total, concurrency):
+    """Closed-loop load; returns the load-test summary"""
+    if aiohttp is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+
+        def send():
+            return session.request(method, url, headers=headers, data=body, timeout=30).status_code
+
+        return loadtest.run_load_test(send, total, concurrency)
+
+    async def run():
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def send():
+                async with session.request(method, url, headers=headers, data=body) as response:
+                    await response.read()
+                    return response.status
+
+            return await loadtest.run_load_test_async(send, total, concurrency)
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=3000, help='requests per endpoint and configuration')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS)
+    args = parser.parse_args()
+
+    module, error = protobuf_service.load_proto_module('sample.proto')
+    if error:
+        sys.exit(error)
+    user = module.UserRequest(name='bench', age=30, email='bench@example.com', active=True, tags=['a', 'b'])
+    endpoints = {
+        'POST json': ('POST', '/api/users', {'Content-Type': 'application/json'},
+                      b'{"name": "bench", "age": 30, "email": "bench@example.com", "active": true, "tags": ["a", "b"]}'),
+        'POST protobuf': ('POST', '/api/users', {'Content-Type': 'application/x-protobuf'}, user.SerializeToString()),
+        'GET limit=10': ('GET', '/api/users?limit=10', {}, None),
+    }
+
+    print(f'{os.cpu_count()} CPU(s), {args.concurrency} concurrent clients, {args.requests} requests each')
+    print(f"{'configuration':>16} " + ' '.join(f'{name + " req/s":>20} {"p99 ms":>8}' for name in endpoints))
+    for config in args.configs:
+        process = start_server(config, args.port)
+        try:
+            cells = []
+            for method, path, headers, body in endpoints.values():
+                result = drive(method, f'http://127.0.0.1:{args.port}{path}', headers, body,
+                               args.requests, args.concurrency)
+                if result['errors']['total']:
+                    print(f"  {config} {method} {path}: {result['errors']['total']} failed", file=sys.stderr)
+                cells.append(f"{result['throughput_rps']:>20,.0f} {result['latency_ms']['p99']:>8.1f}")
+            print(f'{config:>16} ' + ' '.join(cells))
+        finally:
+            stop_server(process)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Messages/second of ProtobufService.generate_test_data vs. the old per-call loop and random mode.
+
+Run from the python/ directory:
+
+    python benchmarks/bench_test_data.py [--messages 100000] [--types UserRequest UserResponse]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.protobuf.descriptor import FieldDescriptor
+from data_generator import validate_distributions
+from protobuf_with_test_data import protobuf_service, is_repeated
+
+
+def legacy_generate(message_class):
+    """The descriptor walk generate_test_data did on every call before plans"""
+    message = message_class()
+    for field in message.DESCRIPTOR.fields:
+        if is_repeated(field):
+            if field.type == FieldDescriptor.TYPE_STRING:
+                getattr(message, field.name).extend([f"tag1_{field.name}", f"tag2_{field.name}"])
+            continue
+        if field.type == FieldDescriptor.TYPE_STRING:
+            setattr(message, field.name, f"test_{field.name}")
+        elif field.type == FieldDescriptor.TYPE_INT32:
+            setattr(message, field.name, 123)
+        elif field.type == FieldDescriptor.TYPE_INT64:
+            setattr(message, field.name, int(time.time()))
+        elif field.type == FieldDescriptor.TYPE_BOOL:
+            setattr(message, field.name, True)
+        elif field.type == FieldDescriptor.TYPE_DOUBLE:
+            setattr(message, field.name, 3.14)
+        elif field.type == FieldDescriptor.TYPE_FLOAT:
+            setattr(message, field.name, 2.71)
+    return message
+
+
+def rate(generate, message_class, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        generate(message_class)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--types', nargs='+', default=['UserRequest', 'UserResponse', 'ProductResponse'])
+    args = parser.parse_args()
+
+    generator = protobuf_service.data_generator
+    distributions, _ = validate_distributions(None)
+    print(f"{'message type':>16} {'legacy msg/s':>14} {'plan msg/s':>14} {'speedup':>8} {'plan bytes':>11} "
+          f"{'random msg/s':>14}")
+    for message_type in args.types:
+        message_class, error = protobuf_service.find_message_class(message_type)
+        if error:
+            sys.exit(error)
+        legacy_rate = rate(legacy_generate, message_class, args.messages)
+        plan_rate = rate(generator.generate, message_class, args.messages)
+        size = generator.generate(message_class).ByteSize()
+        started = time.perf_counter()
+        for _ in generator.iter_random(message_class, args.messages, 0, distributions):
+            pass
+        random_rate = args.messages / (time.perf_counter() - started)
+        print(f'{message_type:>16} {legacy_rate:>14,.0f} {plan_rate:>14,.0f} '
+              f'{plan_rate / legacy_rate:>7.1f}x {size:>11} {random_rate:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main()
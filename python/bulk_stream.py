@@ -0,0 +1,126 @@
+"""Incremental readers for bulk uploads: varint length-delimited protobuf and JSON Lines"""
+
+# Upper bounds for a single record, so a corrupt length prefix or a missing
+# newline cannot make the reader buffer an arbitrarily large body
+DEFAULT_MAX_MESSAGE_SIZE = 4 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StreamFormatError(ValueError):
+    """The stream framing is broken; no further records can be read"""
+
+
+class _ChunkedReader:
+    """Buffers a file-like stream in chunks and hands out exact byte ranges"""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.position = 0
+        self.eof = False
+
+    def _fill(self, size):
+        """Buffer at least ``size`` unread bytes unless the stream ends first"""
+        while len(self.buffer) - self.position < size and not self.eof:
+            if self.position:
+                # Deleting a bytearray prefix just moves its start pointer
+                del self.buffer[:self.position]
+                self.position = 0
+            chunk = self.stream.read(max(self.chunk_size, size - len(self.buffer)))
+            if chunk:
+                self.buffer += chunk
+            else:
+                self.eof = True
+        return len(self.buffer) - self.position
+
+    def read_varint(self):
+        """Next base-128 varint, or None at a clean end of stream"""
+        result = 0
+        for length in range(1, 11):
+            if self._fill(length) < length:
+                if length == 1:
+                    return None
+                raise StreamFormatError('Stream ends inside a length prefix')
+            byte = self.buffer[self.position + length - 1]
+            result |= (byte & 0x7f) << (7 * (length - 1))
+            if not byte & 0x80:
+                self.position += length
+                return result
+        raise StreamFormatError('Length prefix is longer than 10 bytes')
+
+    def read_line(self, max_size):
+        """Next line without its newline, or None at end of stream"""
+        searched = 0
+        while True:
+            end = self.buffer.find(b'\n', self.position + searched)
+            if end >= 0:
+                break
+            available = len(self.buffer) - self.position
+            if available > max_size:
+                raise StreamFormatError(f'Line exceeds the {max_size} byte limit')
+            if self.eof:
+                if not available:
+                    return None
+                end = len(self.buffer)
+                break
+            searched = available
+            self._fill(available + 1)
+        line = bytes(self.buffer[self.position:end])
+        if end - self.position > max_size:
+            raise StreamFormatError(f'Line exceeds the {max_size} byte limit')
+        self.position = min(end + 1, len(self.buffer))
+        return line
+
+    def read(self, size):
+        if self._fill(size) < size:
+            raise StreamFormatError(f'Stream ends inside a {size} byte message')
+        data = bytes(self.buffer[self.position:self.position + size])
+        self.position += size
+        return data
+
+
+def iter_delimited(stream, max_message_size=DEFAULT_MAX_MESSAGE_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the raw messages of a varint length-delimited stream.
+
+    This is the framing of Java's ``writeDelimitedTo``: each message is
+    preceded by its size as a varint. Only one chunk plus the current
+    message is held in memory. Raises StreamFormatError on broken framing.
+    """
+    reader = _ChunkedReader(stream, chunk_size)
+    while True:
+        size = reader.read_varint()
+        if size is None:
+            return
+        if size > max_message_size:
+            raise StreamFormatError(f'Message of {size} bytes exceeds the {max_message_size} byte limit')
+        yield reader.read(size)
+
+
+def iter_json_lines(stream, max_line_size=DEFAULT_MAX_MESSAGE_SIZE, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the non-blank lines of a JSON Lines stream as bytes"""
+    reader = _ChunkedReader(stream, chunk_size)
+    while True:
+        line = reader.read_line(max_line_size)
+        if line is None:
+            return
+        line = line.strip()
+        if line:
+            yield line
+
+
+def encode_varint(value):
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def encode_delimited(messages):
+    """Frame serialized messages (bytes) as one length-delimited stream"""
+    return b''.join(encode_varint(len(message)) + message for message in messages)
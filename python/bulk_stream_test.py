@@ -0,0 +1,30 @@
+import io
+import pytest
+from bulk_stream import iter_delimited, iter_json_lines, encode_delimited, encode_varint, StreamFormatError
+
+
+def test_delimited_round_trip_across_chunk_boundaries():
+    messages = [b'', b'a', b'x' * 300, b'\x80\x01' * 100]
+    stream = io.BytesIO(encode_delimited(messages))
+    assert list(iter_delimited(stream, chunk_size=7)) == messages
+
+
+def test_delimited_rejects_truncated_and_oversized_messages():
+    truncated = io.BytesIO(encode_delimited([b'abc', b'defgh'])[:-2])
+    reader = iter_delimited(truncated, chunk_size=2)
+    assert next(reader) == b'abc'
+    with pytest.raises(StreamFormatError):
+        next(reader)
+
+    with pytest.raises(StreamFormatError):
+        list(iter_delimited(io.BytesIO(encode_varint(1000) + b'x' * 1000), max_message_size=999))
+    with pytest.raises(StreamFormatError):
+        list(iter_delimited(io.BytesIO(b'\x80')))
+
+
+def test_json_lines_skip_blank_lines_and_limit_line_size():
+    stream = io.BytesIO(b'{"a": 1}\n\n  \n{"b": 2}')
+    assert list(iter_json_lines(stream, chunk_size=3)) == [b'{"a": 1}', b'{"b": 2}']
+
+    with pytest.raises(StreamFormatError):
+        list(iter_json_lines(io.BytesIO(b'{"a": "' + b'x' * 50 + b'"}\n'), max_line_size=20))
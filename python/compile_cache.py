@@ -0,0 +1,129 @@
+"""Content-addressed on-disk cache of compiled proto artifacts, with LRU eviction"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from proto_bundle import find_imports
+
+_SUFFIX = '.bin'
+
+
+def _import_name(path, include_paths):
+    for include in include_paths:
+        relative = os.path.relpath(path, include)
+        if not relative.startswith(os.pardir):
+            return relative.replace(os.sep, '/')
+    return os.path.basename(path)
+
+
+def source_key(proto_file_paths, include_paths, compiler_version):
+    """sha256 of proto files, every file they import and the compiler version.
+
+    Imports are resolved against ``include_paths`` like protoc does; imports
+    not found there (well-known types bundled with the compiler) are keyed
+    by name, since the compiler version already pins their content.
+    """
+    digest = hashlib.sha256(compiler_version.encode('utf-8'))
+    roots = sorted(_import_name(path, include_paths) for path in proto_file_paths)
+    digest.update(repr(roots).encode('utf-8'))
+    pending = [(_import_name(path, include_paths), path) for path in proto_file_paths]
+    seen = set()
+    while pending:
+        name, path = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        digest.update(b'\0' + name.encode('utf-8') + b'\0')
+        if path is None:
+            continue
+        with open(path, 'rb') as f:
+            source = f.read()
+        digest.update(hashlib.sha256(source).digest())
+        for imported in find_imports(source):
+            found = next((os.path.join(include, imported) for include in include_paths
+                          if os.path.isfile(os.path.join(include, imported))), None)
+            pending.append((imported, found))
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """Compiled artifacts (bytes) stored under their source key, one file each.
+
+    Entries are written atomically, so several processes can share the
+    directory. Reads refresh an entry's mtime and the in-memory recency
+    order; once the total size exceeds ``max_bytes`` the least recently
+    used entries are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # key -> size, least recently used first
+        self._entries = OrderedDict()
+        existing = []
+        for filename in os.listdir(directory):
+            if filename.endswith(_SUFFIX):
+                stat = os.stat(os.path.join(directory, filename))
+                existing.append((stat.st_mtime, filename[:-len(_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """The cached artifact for ``key``, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            with self._lock:
+                self._entries.pop(key, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        temp_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._entries.values())
+        # Always keep the entry just written, even if it alone exceeds the cap
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,59 @@
+import os
+import time
+from compile_cache import CompileCache, source_key
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_source_key_covers_imports_and_compiler_version(tmp_path):
+    write(tmp_path / 'common.proto', 'syntax = "proto3";\nmessage Id { string value = 1; }\n')
+    main = write(tmp_path / 'main.proto', 'syntax = "proto3";\n// import "ignored.proto";\n'
+                                          'import "common.proto";\nimport "google/protobuf/any.proto";\n'
+                                          'message User { Id id = 1; }\n')
+    key = source_key([main], [str(tmp_path)], 'protoc 1')
+    assert key == source_key([main], [str(tmp_path)], 'protoc 1')
+    assert key != source_key([main], [str(tmp_path)], 'protoc 2')
+
+    # Editing an imported file changes the key of every file importing it
+    write(tmp_path / 'common.proto', 'syntax = "proto3";\nmessage Id { int64 value = 1; }\n')
+    assert source_key([main], [str(tmp_path)], 'protoc 1') != key
+
+
+def test_source_key_covers_imports_sharing_a_line(tmp_path):
+    write(tmp_path / 'b.proto', 'syntax = "proto3";\nmessage B {}\n')
+    main = write(tmp_path / 'a.proto', 'syntax = "proto3"; import "b.proto";\nmessage A { B b = 1; }\n')
+    key = source_key([main], [str(tmp_path)], 'protoc 1')
+    write(tmp_path / 'b.proto', 'syntax = "proto3";\nmessage B { string id = 1; }\n')
+    assert source_key([main], [str(tmp_path)], 'protoc 1') != key
+
+
+def test_get_put_and_lru_eviction(tmp_path):
+    cache = CompileCache(str(tmp_path), max_bytes=250)
+    for key in ('a', 'b'):
+        cache.put(key, b'x' * 100)
+    assert cache.get('a') == b'x' * 100
+    assert cache.get('missing') is None
+
+    # 'b' is the least recently used once 'a' was read
+    cache.put('c', b'x' * 100)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert not os.path.exists(tmp_path / 'b.bin')
+    assert cache.stats() == {'entries': 2, 'bytes': 200, 'max_bytes': 250,
+                             'hits': 3, 'misses': 2, 'evictions': 1}
+
+
+def test_restart_keeps_entries_in_recency_order(tmp_path):
+    cache = CompileCache(str(tmp_path), max_bytes=250)
+    cache.put('old', b'x' * 100)
+    cache.put('new', b'x' * 100)
+    past = time.time() - 60
+    os.utime(tmp_path / 'old.bin', (past, past))
+
+    reopened = CompileCache(str(tmp_path), max_bytes=250)
+    assert reopened.get('new') == b'x' * 100
+    reopened.put('newest', b'x' * 100)
+    assert sorted(name for name in os.listdir(tmp_path)) == ['new.bin', 'newest.bin']
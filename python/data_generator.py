@@ -0,0 +1,384 @@
+"""Test-data generation from precompiled per-descriptor plans"""
+import json
+import random
+import string
+import threading
+import time
+import weakref
+from google.protobuf.descriptor import FieldDescriptor
+from proto_fields import is_repeated
+
+# Nested messages below this depth are left empty, which also ends recursion
+DEFAULT_MAX_DEPTH = 3
+# Elements generated for repeated fields
+REPEATED_COUNT = 2
+
+_INT64_TYPES = {
+    FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_UINT64, FieldDescriptor.TYPE_SINT64,
+    FieldDescriptor.TYPE_FIXED64, FieldDescriptor.TYPE_SFIXED64,
+}
+_INT32_TYPES = {
+    FieldDescriptor.TYPE_INT32, FieldDescriptor.TYPE_UINT32, FieldDescriptor.TYPE_SINT32,
+    FieldDescriptor.TYPE_FIXED32, FieldDescriptor.TYPE_SFIXED32,
+}
+_MESSAGE_TYPES = {FieldDescriptor.TYPE_MESSAGE, FieldDescriptor.TYPE_GROUP}
+
+# Random mode defaults; each can be overridden globally or per field path
+DEFAULT_DISTRIBUTIONS = {
+    'string_length': [4, 16],
+    'int_range': [0, 1000000],
+    'float_range': [0.0, 1000.0],
+    'repeated_size': [0, 4],
+    # Number of distinct values drawn per field; None means unbounded
+    'cardinality': None,
+}
+_RANGE_KEYS = ('string_length', 'int_range', 'float_range', 'repeated_size')
+_STRING_ALPHABET = string.ascii_letters + string.digits
+
+_INT_LIMITS = {
+    FieldDescriptor.TYPE_INT32: (-2 ** 31, 2 ** 31 - 1),
+    FieldDescriptor.TYPE_SINT32: (-2 ** 31, 2 ** 31 - 1),
+    FieldDescriptor.TYPE_SFIXED32: (-2 ** 31, 2 ** 31 - 1),
+    FieldDescriptor.TYPE_UINT32: (0, 2 ** 32 - 1),
+    FieldDescriptor.TYPE_FIXED32: (0, 2 ** 32 - 1),
+    FieldDescriptor.TYPE_INT64: (-2 ** 63, 2 ** 63 - 1),
+    FieldDescriptor.TYPE_SINT64: (-2 ** 63, 2 ** 63 - 1),
+    FieldDescriptor.TYPE_SFIXED64: (-2 ** 63, 2 ** 63 - 1),
+    FieldDescriptor.TYPE_UINT64: (0, 2 ** 64 - 1),
+    FieldDescriptor.TYPE_FIXED64: (0, 2 ** 64 - 1),
+}
+
+# Any needs a resolvable type_url to be converted to JSON, so it stays empty
+_SKIPPED_MESSAGES = {'google.protobuf.Any'}
+
+
+def _is_map(field):
+    return field.message_type is not None and field.message_type.GetOptions().map_entry
+
+
+def sample_value(field, index=0):
+    """Deterministic sample value for a scalar or enum field"""
+    if field.type == FieldDescriptor.TYPE_STRING:
+        return f'tag{index}_{field.name}' if index else f'test_{field.name}'
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return f'test_{field.name}'.encode()
+    if field.type in _INT32_TYPES:
+        return 123
+    if field.type in _INT64_TYPES:
+        return int(time.time())
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return True
+    if field.type == FieldDescriptor.TYPE_DOUBLE:
+        return 3.14
+    if field.type == FieldDescriptor.TYPE_FLOAT:
+        return 2.71
+    if field.type == FieldDescriptor.TYPE_ENUM:
+        # Prefer the first non-default value so the field shows up on the wire
+        values = field.enum_type.values
+        return (values[1] if len(values) > 1 else values[0]).number
+    raise TypeError(f'No sample value for field {field.full_name} of type {field.type}')
+
+
+class MessagePlan:
+    """A fully populated template plus the fields refreshed on every call.
+
+    Walking the descriptor, picking values per field type and setting them
+    one by one happens once, when the plan is compiled. Generating a message
+    is then a single C-level CopyFrom of the template; only singular 64-bit
+    integer fields, which carry the current timestamp, are set per call.
+    """
+
+    __slots__ = ('message_class', 'template', 'timestamp_fields')
+
+    def __init__(self, message_class, max_depth=DEFAULT_MAX_DEPTH):
+        self.message_class = message_class
+        self.template = message_class()
+        # (path of submessage field names, field name)
+        self.timestamp_fields = []
+        self._fill(self.template, 0, max_depth, ())
+
+    def _fill(self, message, depth, max_depth, path):
+        # path is None inside repeated fields and maps, whose timestamps stay fixed
+        filled_oneofs = set()
+        for field in message.DESCRIPTOR.fields:
+            oneof = field.containing_oneof
+            if oneof is not None:
+                # Only the first member of a oneof is set; later ones would replace it
+                if oneof.full_name in filled_oneofs:
+                    continue
+                filled_oneofs.add(oneof.full_name)
+
+            if _is_map(field):
+                self._fill_map(getattr(message, field.name), field, depth, max_depth)
+            elif field.type in _MESSAGE_TYPES:
+                if depth + 1 >= max_depth or field.message_type.full_name in _SKIPPED_MESSAGES:
+                    continue
+                if is_repeated(field):
+                    for _ in range(REPEATED_COUNT):
+                        self._fill(getattr(message, field.name).add(), depth + 1, max_depth, None)
+                else:
+                    submessage = getattr(message, field.name)
+                    submessage.SetInParent()
+                    self._fill(submessage, depth + 1, max_depth,
+                               path + (field.name,) if path is not None else None)
+            elif is_repeated(field):
+                getattr(message, field.name).extend(
+                    sample_value(field, index) for index in range(1, REPEATED_COUNT + 1))
+            else:
+                setattr(message, field.name, sample_value(field))
+                if field.type in _INT64_TYPES and path is not None:
+                    self.timestamp_fields.append((path, field.name))
+
+    def _fill_map(self, container, field, depth, max_depth):
+        key_field = field.message_type.fields_by_name['key']
+        value_field = field.message_type.fields_by_name['value']
+        key = sample_value(key_field)
+        if value_field.type in _MESSAGE_TYPES:
+            if depth + 1 < max_depth and value_field.message_type.full_name not in _SKIPPED_MESSAGES:
+                self._fill(container[key], depth + 1, max_depth, None)
+        else:
+            container[key] = sample_value(value_field)
+
+    def generate(self):
+        message = self.message_class()
+        message.CopyFrom(self.template)
+        if self.timestamp_fields:
+            now = int(time.time())
+            for path, name in self.timestamp_fields:
+                target = message
+                for part in path:
+                    target = getattr(target, part)
+                setattr(target, name, now)
+        return message
+
+
+def _validate_spec(spec, where):
+    for key, value in spec.items():
+        if key in _RANGE_KEYS:
+            if (not isinstance(value, list) or len(value) != 2
+                    or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+                    or value[0] > value[1]):
+                return f'{where}{key} must be a [min, max] pair with min <= max'
+            if key in ('string_length', 'repeated_size') and (value[0] < 0 or not all(isinstance(v, int) for v in value)):
+                return f'{where}{key} must be non-negative integers'
+        elif key == 'cardinality':
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                return f'{where}cardinality must be a positive integer'
+        elif key == 'values':
+            if not isinstance(value, list) or not value:
+                return f'{where}values must be a non-empty list'
+        else:
+            return f'{where}unknown distribution setting: {key}'
+    return None
+
+
+def validate_distributions(distributions):
+    """Merge user distributions over the defaults; returns (distributions, error).
+
+    Besides the global settings, ``fields`` maps a dotted field path
+    (``user.age``) or a bare field name (``age``) to overrides for that
+    field, which may also list explicit ``values`` to choose from. Those
+    are checked against the field types when a RandomPlan is compiled,
+    which raises ValueError for a mismatch.
+    """
+    distributions = dict(distributions or {})
+    fields = distributions.pop('fields', {})
+    if not isinstance(fields, dict) or not all(isinstance(spec, dict) for spec in fields.values()):
+        return None, 'fields must map field paths to distribution settings'
+    if 'values' in distributions:
+        return None, 'values can only be set per field'
+    error = _validate_spec(distributions, '')
+    for path, spec in fields.items():
+        error = error or _validate_spec(spec, f'fields.{path}: ')
+    if error:
+        return None, error
+    return {**DEFAULT_DISTRIBUTIONS, **distributions, 'fields': fields}, None
+
+
+def _field_values(field, values):
+    """Explicit ``values`` checked against the field type; raises ValueError on a mismatch"""
+    checked = []
+    for value in values:
+        if field.type == FieldDescriptor.TYPE_BYTES and isinstance(value, str):
+            # JSON has no bytes type
+            value = value.encode()
+        if not _fits(field, value):
+            raise ValueError(f'value {value!r} does not fit field {field.full_name}')
+        checked.append(value)
+    return checked
+
+
+def _fits(field, value):
+    is_int = isinstance(value, int) and not isinstance(value, bool)
+    if field.type in _INT_LIMITS:
+        type_min, type_max = _INT_LIMITS[field.type]
+        return is_int and type_min <= value <= type_max
+    if field.type in (FieldDescriptor.TYPE_DOUBLE, FieldDescriptor.TYPE_FLOAT):
+        return is_int or isinstance(value, float)
+    if field.type == FieldDescriptor.TYPE_BOOL:
+        return isinstance(value, bool)
+    if field.type == FieldDescriptor.TYPE_STRING:
+        return isinstance(value, str)
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return isinstance(value, bytes)
+    if field.type == FieldDescriptor.TYPE_ENUM:
+        if isinstance(value, str):
+            return value in field.enum_type.values_by_name
+        return is_int and -2 ** 31 <= value < 2 ** 31
+    return False
+
+
+class RandomPlan:
+    """Per-field value generators for seeded random messages.
+
+    Field types, ranges and overrides are resolved once; each call draws
+    every value from the given ``random.Random`` and builds the message from
+    nested dicts in one constructor call. The same seed therefore yields the
+    same stream of messages. Every member of a oneof is equally likely.
+    """
+
+    def __init__(self, message_class, distributions, max_depth=DEFAULT_MAX_DEPTH):
+        self.message_class = message_class
+        self._distributions = distributions
+        self._build = self._compile(message_class.DESCRIPTOR, 0, max_depth, '')
+
+    def _spec(self, field, path):
+        fields = self._distributions['fields']
+        return {**self._distributions, **fields.get(field.name, {}), **fields.get(path, {})}
+
+    def _compile(self, descriptor, depth, max_depth, prefix):
+        fields = []
+        oneofs = {}
+        for field in descriptor.fields:
+            path = f'{prefix}{field.name}'
+            generate = self._field_generator(field, depth, max_depth, path)
+            if generate is None:
+                continue
+            oneof = field.containing_oneof
+            # Single-member oneofs (proto3 optional) are just fields with presence
+            if oneof is not None and len(oneof.fields) > 1:
+                oneofs.setdefault(oneof.full_name, []).append((field.name, generate))
+            else:
+                fields.append((field.name, generate))
+        oneof_members = list(oneofs.values())
+
+        def build(rng):
+            values = {name: generate(rng) for name, generate in fields}
+            for members in oneof_members:
+                name, generate = members[rng.randrange(len(members))]
+                values[name] = generate(rng)
+            return values
+        return build
+
+    def _field_generator(self, field, depth, max_depth, path):
+        spec = self._spec(field, path)
+        size_min, size_max = spec['repeated_size']
+
+        if _is_map(field):
+            key_field = field.message_type.fields_by_name['key']
+            value_field = field.message_type.fields_by_name['value']
+            key = self._scalar_generator(key_field, spec)
+            value = self._value_generator(value_field, depth, max_depth, path)
+            if value is None:
+                return None
+            return lambda rng: {key(rng): value(rng) for _ in range(rng.randint(size_min, size_max))}
+
+        value = self._value_generator(field, depth, max_depth, path)
+        if value is None or not is_repeated(field):
+            return value
+        return lambda rng: [value(rng) for _ in range(rng.randint(size_min, size_max))]
+
+    def _value_generator(self, field, depth, max_depth, path):
+        if field.type in _MESSAGE_TYPES:
+            if depth + 1 >= max_depth or field.message_type.full_name in _SKIPPED_MESSAGES:
+                return None
+            return self._compile(field.message_type, depth + 1, max_depth, f'{path}.')
+        return self._scalar_generator(field, self._spec(field, path))
+
+    def _scalar_generator(self, field, spec):
+        if spec.get('values'):
+            values = _field_values(field, spec['values'])
+            return lambda rng: values[rng.randrange(len(values))]
+
+        cardinality = spec['cardinality']
+        if field.type == FieldDescriptor.TYPE_BOOL:
+            return lambda rng: rng.random() < 0.5
+        if field.type == FieldDescriptor.TYPE_ENUM:
+            numbers = [value.number for value in field.enum_type.values]
+            return lambda rng: numbers[rng.randrange(len(numbers))]
+
+        if field.type in _INT_LIMITS:
+            type_min, type_max = _INT_LIMITS[field.type]
+            low = min(max(int(spec['int_range'][0]), type_min), type_max)
+            high = max(min(int(spec['int_range'][1]), type_max), low)
+            if cardinality:
+                span = min(cardinality, high - low + 1)
+                return lambda rng: low + rng.randrange(span)
+            return lambda rng: rng.randint(low, high)
+
+        if field.type in (FieldDescriptor.TYPE_DOUBLE, FieldDescriptor.TYPE_FLOAT):
+            low, high = spec['float_range']
+            if cardinality:
+                step = (high - low) / cardinality
+                return lambda rng: low + step * rng.randrange(cardinality)
+            return lambda rng: rng.uniform(low, high)
+
+        if field.type in (FieldDescriptor.TYPE_STRING, FieldDescriptor.TYPE_BYTES):
+            if cardinality:
+                name = field.name
+                if field.type == FieldDescriptor.TYPE_BYTES:
+                    return lambda rng: f'{name}_{rng.randrange(cardinality)}'.encode()
+                return lambda rng: f'{name}_{rng.randrange(cardinality)}'
+            length_min, length_max = spec['string_length']
+            if field.type == FieldDescriptor.TYPE_BYTES:
+                return lambda rng: bytes(rng.getrandbits(8) for _ in range(rng.randint(length_min, length_max)))
+            return lambda rng: ''.join(rng.choices(_STRING_ALPHABET, k=rng.randint(length_min, length_max)))
+
+        raise TypeError(f'No random generator for field {field.full_name} of type {field.type}')
+
+    def generate(self, rng):
+        return self.message_class(**self._build(rng))
+
+
+class DataGenerator:
+    """Compiles one MessagePlan per message class and reuses it.
+
+    Plans are keyed weakly by class, so classes dropped when a .proto file
+    is recompiled release their plans too.
+    """
+
+    def __init__(self, max_depth=DEFAULT_MAX_DEPTH):
+        self.max_depth = max_depth
+        self._plans = weakref.WeakKeyDictionary()
+        # message class -> {distributions key: RandomPlan}
+        self._random_plans = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def plan_for(self, message_class):
+        plan = self._plans.get(message_class)
+        if plan is None:
+            plan = MessagePlan(message_class, self.max_depth)
+            with self._lock:
+                plan = self._plans.setdefault(message_class, plan)
+        return plan
+
+    def generate(self, message_class):
+        return self.plan_for(message_class).generate()
+
+    def random_plan_for(self, message_class, distributions):
+        """RandomPlan for validated distributions (see validate_distributions)"""
+        key = json.dumps(distributions, sort_keys=True)
+        plans = self._random_plans.get(message_class)
+        plan = plans.get(key) if plans is not None else None
+        if plan is None:
+            plan = RandomPlan(message_class, distributions, self.max_depth)
+            with self._lock:
+                plan = self._random_plans.setdefault(message_class, {}).setdefault(key, plan)
+        return plan
+
+    def iter_random(self, message_class, count, seed, distributions):
+        """Yield ``count`` random messages; the same seed gives the same stream"""
+        plan = self.random_plan_for(message_class, distributions)
+        rng = random.Random(seed)
+        for _ in range(count):
+            yield plan.generate(rng)
@@ -0,0 +1,115 @@
+import pytest
+import proto_compiler
+from google.protobuf.json_format import MessageToDict
+from data_generator import DataGenerator, validate_distributions
+
+pytestmark = pytest.mark.skipif(not proto_compiler.in_process_available(), reason='grpcio-tools not installed')
+
+SHAPES_PROTO = """
+syntax = "proto3";
+import "google/protobuf/any.proto";
+
+enum Color {
+    COLOR_UNSPECIFIED = 0;
+    RED = 1;
+}
+
+message Node {
+    string label = 1;
+    Node child = 2;
+    repeated Node siblings = 3;
+}
+
+message Shape {
+    string name = 1;
+    bytes blob = 2;
+    Color color = 3;
+    int64 created_at = 4;
+    repeated int32 sizes = 5;
+    map<string, Node> nodes = 6;
+    map<int32, string> labels = 7;
+    oneof kind {
+        double radius = 8;
+        float width = 9;
+    }
+    optional uint32 sides = 10;
+    Node root = 11;
+    google.protobuf.Any extra = 12;
+}
+"""
+
+
+@pytest.fixture(scope='module')
+def shapes(tmp_path_factory):
+    proto_dir = tmp_path_factory.mktemp('protos')
+    (proto_dir / 'shapes.proto').write_text(SHAPES_PROTO)
+    descriptor_set, error = proto_compiler.compile_to_descriptor_set(str(proto_dir / 'shapes.proto'), [str(proto_dir)])
+    assert error is None
+    return proto_compiler.build_module(descriptor_set, 'shapes.proto')
+
+
+def test_plan_covers_every_field_kind(shapes):
+    shape = DataGenerator(max_depth=3).generate(shapes.Shape)
+    assert shape.name == 'test_name'
+    assert shape.blob == b'test_blob'
+    assert shape.color == shapes.RED
+    assert shape.created_at > 0
+    assert list(shape.sizes) == [123, 123]
+    assert shape.labels[123] == 'test_value'
+    assert shape.nodes['test_key'].label == 'test_label'
+    assert shape.WhichOneof('kind') == 'radius'
+    assert shape.HasField('sides')
+    assert not shape.HasField('extra')
+    # Recursion stops at max_depth: Shape -> root -> child, but no grandchild
+    assert shape.root.child.label == 'test_label'
+    assert not shape.root.child.HasField('child')
+    assert len(shape.root.siblings) == 2
+    MessageToDict(shape)
+
+
+def test_plan_is_compiled_once_and_messages_are_independent(shapes):
+    generator = DataGenerator()
+    first = generator.generate(shapes.Shape)
+    assert generator.plan_for(shapes.Shape) is generator.plan_for(shapes.Shape)
+    first.root.label = 'changed'
+    assert generator.generate(shapes.Shape).root.label == 'test_label'
+
+
+def test_random_streams_are_reproducible_and_respect_distributions(shapes):
+    distributions, error = validate_distributions({
+        'string_length': [3, 5],
+        'repeated_size': [1, 3],
+        'fields': {'sizes': {'int_range': [10, 20]}, 'root.label': {'cardinality': 4}},
+    })
+    assert error is None
+    generator = DataGenerator()
+    first = [m.SerializeToString() for m in generator.iter_random(shapes.Shape, 50, 7, distributions)]
+    again = [m.SerializeToString() for m in generator.iter_random(shapes.Shape, 50, 7, distributions)]
+    other = [m.SerializeToString() for m in generator.iter_random(shapes.Shape, 50, 8, distributions)]
+    assert first == again
+    assert first != other
+
+    shapes_list = list(generator.iter_random(shapes.Shape, 200, 1, distributions))
+    assert all(3 <= len(shape.name) <= 5 for shape in shapes_list)
+    assert all(1 <= len(shape.sizes) <= 3 and all(10 <= size <= 20 for size in shape.sizes) for shape in shapes_list)
+    assert len({shape.root.label for shape in shapes_list}) <= 4
+    assert {shape.WhichOneof('kind') for shape in shapes_list} == {'radius', 'width'}
+
+
+def test_validate_distributions_rejects_bad_settings():
+    assert validate_distributions({'int_range': [5, 1]})[1]
+    assert validate_distributions({'fields': {'age': {'cardinality': 0}}})[1]
+    assert validate_distributions({'colour': 1})[1]
+    assert validate_distributions(None)[0]['string_length'] == [4, 16]
+
+
+def test_random_plan_checks_values_against_field_types(shapes):
+    generator = DataGenerator()
+    for values in ([1, 'two'], [2 ** 40], [True]):
+        distributions, _ = validate_distributions({'fields': {'sizes': {'values': values}}})
+        with pytest.raises(ValueError):
+            generator.random_plan_for(shapes.Shape, distributions)
+    distributions, _ = validate_distributions({'fields': {'blob': {'values': ['raw']}, 'color': {'values': ['RED']}}})
+    shape = next(generator.iter_random(shapes.Shape, 1, 3, distributions))
+    assert shape.blob == b'raw'
+    assert shape.color == shapes.RED
@@ -0,0 +1,156 @@
+"""gRPC calls driven by compiled service descriptors, over channels reused per target"""
+import threading
+import time
+from google.protobuf import message_factory
+
+try:
+    import grpc
+except ImportError:
+    grpc = None
+
+
+def available():
+    return grpc is not None
+
+
+def method_path(method):
+    """The HTTP/2 path of an RPC: /package.Service/Method"""
+    return f'/{method.containing_service.full_name}/{method.name}'
+
+
+def call_kind(method):
+    """unary_unary, unary_stream, stream_unary or stream_stream"""
+    return '_'.join('stream' if streaming else 'unary'
+                    for streaming in (method.client_streaming, method.server_streaming))
+
+
+def describe_method(method):
+    return {
+        'rpc': method_path(method)[1:],
+        'input_type': method.input_type.full_name,
+        'output_type': method.output_type.full_name,
+        'client_streaming': method.client_streaming,
+        'server_streaming': method.server_streaming,
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _serialize(message):
+    return message.SerializeToString()
+
+
+class ChannelPool:
+    """One channel per target, shared by every call to it.
+
+    A channel multiplexes concurrent calls as HTTP/2 streams over one
+    connection, so reusing it saves a TCP and HTTP/2 handshake per call and
+    lets many sender threads share it. Multi-callables are cached as well.
+    """
+
+    def __init__(self, options=None):
+        self.options = list(options or [])
+        self._channels = {}
+        self._callables = {}
+        self._lock = threading.Lock()
+
+    def channel(self, target, tls=False):
+        with self._lock:
+            channel = self._channels.get((target, tls))
+            if channel is None:
+                if tls:
+                    channel = grpc.secure_channel(target, grpc.ssl_channel_credentials(), options=self.options)
+                else:
+                    channel = grpc.insecure_channel(target, options=self.options)
+                self._channels[(target, tls)] = channel
+            return channel
+
+    def multicallable(self, target, method, tls=False, raw=False):
+        """Cached callable for one RPC; with ``raw`` it takes and returns bytes"""
+        key = (target, tls, method_path(method), raw)
+        callable_ = self._callables.get(key)
+        if callable_ is None:
+            channel = self.channel(target, tls)
+            if raw:
+                serializer = deserializer = None
+            else:
+                serializer = _serialize
+                deserializer = message_factory.GetMessageClass(method.output_type).FromString
+            factory = getattr(channel, call_kind(method))
+            callable_ = factory(method_path(method), request_serializer=serializer, response_deserializer=deserializer)
+            with self._lock:
+                callable_ = self._callables.setdefault(key, callable_)
+        return callable_
+
+    def stats(self):
+        with self._lock:
+            return {
+                'channels': len(self._channels),
+                'targets': sorted(target for target, _ in self._channels),
+            }
+
+    def close(self):
+        with self._lock:
+            channels = list(self._channels.values())
+            self._channels.clear()
+            self._callables.clear()
+        for channel in channels:
+            channel.close()
+
+
+def invoke(multicallable, method, requests, timeout=None, metadata=None):
+    """Make one call of any kind; returns (responses, outcome).
+
+    ``requests`` is a list of request messages; unary RPCs send the first,
+    client-streaming RPCs stream them all. ``timeout`` is the deadline in
+    seconds. RPC failures (including DEADLINE_EXCEEDED) are not raised but
+    reported in ``outcome['code']`` along with details and metadata.
+    """
+    request = iter(requests) if method.client_streaming else requests[0]
+    responses = []
+    first_response = None
+    started = time.perf_counter()
+    try:
+        if method.server_streaming:
+            call = multicallable(request, timeout=timeout, metadata=metadata)
+            for response in call:
+                if first_response is None:
+                    first_response = time.perf_counter()
+                responses.append(response)
+        else:
+            response, call = multicallable.with_call(request, timeout=timeout, metadata=metadata)
+            first_response = time.perf_counter()
+            responses.append(response)
+        code = grpc.StatusCode.OK
+    except grpc.RpcError as e:
+        # Errors raised by a call are the call itself, with its status and metadata
+        call = e
+        code = e.code()
+    finished = time.perf_counter()
+
+    return responses, {
+        'code': code.name,
+        'details': call.details() or '',
+        'initial_metadata': dict(call.initial_metadata() or ()),
+        'trailing_metadata': dict(call.trailing_metadata() or ()),
+        'timing': {
+            'first_response_ms': _ms(first_response - started) if first_response else None,
+            'total_ms': _ms(finished - started),
+        },
+    }
+
+
+def send_raw(multicallable, method, payload, timeout=None, metadata=None):
+    """Send one pre-encoded request on a raw multi-callable; returns the status code name"""
+    request = iter((payload,)) if method.client_streaming else payload
+    try:
+        if method.server_streaming:
+            for _ in multicallable(request, timeout=timeout, metadata=metadata):
+                pass
+        else:
+            multicallable(request, timeout=timeout, metadata=metadata)
+    except grpc.RpcError as e:
+        return e.code().name
+    return 'OK'
@@ -0,0 +1,118 @@
+import pytest
+import proto_compiler
+import grpc_client
+
+pytestmark = pytest.mark.skipif(not (grpc_client.available() and proto_compiler.in_process_available()),
+                                reason='grpcio / grpcio-tools not installed')
+
+GREETER_PROTO = """
+syntax = "proto3";
+package demo.v1;
+
+message HelloRequest {
+    string name = 1;
+}
+
+message HelloReply {
+    string message = 1;
+}
+
+service Greeter {
+    rpc SayHello(HelloRequest) returns (HelloReply);
+    rpc StreamHellos(HelloRequest) returns (stream HelloReply);
+    rpc CollectHellos(stream HelloRequest) returns (HelloReply);
+    rpc Chat(stream HelloRequest) returns (stream HelloReply);
+}
+"""
+
+
+@pytest.fixture(scope='module')
+def greeter(tmp_path_factory):
+    proto_dir = tmp_path_factory.mktemp('protos')
+    (proto_dir / 'greeter.proto').write_text(GREETER_PROTO)
+    descriptor_set, error = proto_compiler.compile_to_descriptor_set(str(proto_dir / 'greeter.proto'), [str(proto_dir)])
+    assert error is None
+    return proto_compiler.build_module(descriptor_set, 'greeter.proto')
+
+
+@pytest.fixture
+def server(greeter):
+    from grpc_stub import StubServer
+
+    def respond(method, requests):
+        names = ','.join(request.name for request in requests)
+        count = 3 if method.server_streaming else 1
+        return [greeter.HelloReply(message=f'{method.name}:{names}:{index}') for index in range(count)]
+
+    with StubServer([greeter.DESCRIPTOR.services_by_name['Greeter']], respond=respond) as server:
+        yield server
+
+
+def method(greeter, name):
+    return greeter.DESCRIPTOR.services_by_name['Greeter'].methods_by_name[name]
+
+
+def test_describes_methods(greeter):
+    assert grpc_client.method_path(method(greeter, 'SayHello')) == '/demo.v1.Greeter/SayHello'
+    assert grpc_client.call_kind(method(greeter, 'Chat')) == 'stream_stream'
+    assert grpc_client.describe_method(method(greeter, 'StreamHellos')) == {
+        'rpc': 'demo.v1.Greeter/StreamHellos',
+        'input_type': 'demo.v1.HelloRequest',
+        'output_type': 'demo.v1.HelloReply',
+        'client_streaming': False,
+        'server_streaming': True,
+    }
+
+
+def test_invokes_every_call_kind(greeter, server):
+    pool = grpc_client.ChannelPool()
+    ada, bob = greeter.HelloRequest(name='ada'), greeter.HelloRequest(name='bob')
+    expected = {
+        'SayHello': ['SayHello:ada:0'],
+        'StreamHellos': ['StreamHellos:ada:0', 'StreamHellos:ada:1', 'StreamHellos:ada:2'],
+        'CollectHellos': ['CollectHellos:ada,bob:0'],
+        'Chat': ['Chat:ada,bob:0', 'Chat:ada,bob:1', 'Chat:ada,bob:2'],
+    }
+    try:
+        for name, messages in expected.items():
+            rpc = method(greeter, name)
+            responses, outcome = grpc_client.invoke(pool.multicallable(server.target, rpc), rpc, [ada, bob],
+                                                    timeout=5, metadata=(('x-test', '1'),))
+            assert outcome['code'] == 'OK'
+            assert [response.message for response in responses] == messages
+            assert outcome['trailing_metadata']['x-stub-requests'] == ('2' if rpc.client_streaming else '1')
+            assert outcome['timing']['total_ms'] >= outcome['timing']['first_response_ms']
+        # Every call went over one channel
+        assert pool.stats() == {'channels': 1, 'targets': [server.target]}
+        assert pool.multicallable(server.target, rpc) is pool.multicallable(server.target, rpc)
+    finally:
+        pool.close()
+
+
+def test_reports_deadline_and_unavailable_instead_of_raising(greeter, server):
+    pool = grpc_client.ChannelPool()
+    rpc = method(greeter, 'SayHello')
+    server.delay = 0.5
+    try:
+        responses, outcome = grpc_client.invoke(pool.multicallable(server.target, rpc), rpc,
+                                                [greeter.HelloRequest()], timeout=0.05)
+        assert responses == []
+        assert outcome['code'] == 'DEADLINE_EXCEEDED'
+        assert outcome['timing']['first_response_ms'] is None
+
+        raw = pool.multicallable('127.0.0.1:1', rpc, raw=True)
+        assert grpc_client.send_raw(raw, rpc, b'', timeout=1) == 'UNAVAILABLE'
+    finally:
+        pool.close()
+
+
+def test_send_raw_passes_encoded_payloads(greeter, server):
+    pool = grpc_client.ChannelPool()
+    try:
+        for name in ('SayHello', 'StreamHellos', 'CollectHellos', 'Chat'):
+            rpc = method(greeter, name)
+            raw = pool.multicallable(server.target, rpc, raw=True)
+            assert grpc_client.send_raw(raw, rpc, greeter.HelloRequest(name='x').SerializeToString(), timeout=5) == 'OK'
+        assert sum(server.calls.values()) == 4
+    finally:
+        pool.close()
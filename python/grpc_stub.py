@@ -0,0 +1,72 @@
+"""In-process gRPC server that answers any compiled service from its descriptors"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from google.protobuf import message_factory
+from data_generator import DataGenerator
+from grpc_client import grpc, call_kind, _serialize
+
+
+class StubServer:
+    """A stand-in for a real gRPC service, for exercising the client side.
+
+    Every method of ``services`` (ServiceDescriptors) is served. Replies
+    come from ``respond(method, requests)``, which returns a list of
+    response messages; by default one generated output message, or
+    ``stream_size`` of them for server-streaming methods. ``delay``
+    seconds are slept before replying, to exercise deadlines. The number
+    of request messages received is sent back as ``x-stub-requests``
+    trailing metadata, and calls are counted per method in ``calls``.
+    """
+
+    def __init__(self, services, respond=None, stream_size=3, delay=0.0, max_workers=16, host='127.0.0.1'):
+        self.services = list(services)
+        self.respond = respond or self._generated_responses
+        self.stream_size = stream_size
+        self.delay = delay
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+        self._generator = DataGenerator()
+        self._server = grpc.server(ThreadPoolExecutor(max_workers=max_workers))
+        for service in self.services:
+            handlers = {method.name: self._handler(method) for method in service.methods}
+            self._server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(service.full_name, handlers),))
+        self.port = self._server.add_insecure_port(f'{host}:0')
+        self.target = f'{host}:{self.port}'
+
+    def _generated_responses(self, method, requests):
+        output_class = message_factory.GetMessageClass(method.output_type)
+        count = self.stream_size if method.server_streaming else 1
+        return [self._generator.generate(output_class) for _ in range(count)]
+
+    def _reply(self, method, requests, context):
+        with self._calls_lock:
+            self.calls[method.full_name] += 1
+        if self.delay:
+            time.sleep(self.delay)
+        context.set_trailing_metadata((('x-stub-requests', str(len(requests))),))
+        return self.respond(method, requests)
+
+    def _handler(self, method):
+        def handle(request, context):
+            requests = list(request) if method.client_streaming else [request]
+            responses = self._reply(method, requests, context)
+            return iter(responses) if method.server_streaming else responses[0]
+
+        input_class = message_factory.GetMessageClass(method.input_type)
+        handler_factory = getattr(grpc, f'{call_kind(method)}_rpc_method_handler')
+        return handler_factory(handle, request_deserializer=input_class.FromString, response_serializer=_serialize)
+
+    def start(self):
+        self._server.start()
+        return self
+
+    def stop(self, grace=None):
+        self._server.stop(grace).wait()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,198 @@
+"""Shared, connection-pooled HTTP client for outbound test requests"""
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+
+# Timing record of the request currently sent by this thread, if any
+_local = threading.local()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class _CountingConnectionMixin:
+    # Set by the owning pool; every (re)connect of the socket is reported to it
+    owner_pool = None
+
+    def connect(self):
+        timing = getattr(_local, 'timing', None)
+        started = time.perf_counter()
+        super().connect()
+        if timing is not None:
+            # Whatever connect() spent beyond DNS and TCP is the TLS handshake
+            connect_ms = _ms(time.perf_counter() - started)
+            timing['connect_ms'] = connect_ms
+            timing['tls_handshake_ms'] = round(max(connect_ms - timing['dns_ms'] - timing['tcp_connect_ms'], 0.0), 3)
+            timing['connection_reused'] = False
+        if self.owner_pool is not None:
+            self.owner_pool.record_connect()
+
+    def _new_conn(self):
+        timing = getattr(_local, 'timing', None)
+        if timing is None:
+            return super()._new_conn()
+
+        # Resolve up front so DNS and TCP connect can be timed separately,
+        # then try the addresses in order like create_connection() does
+        dns_host = self._dns_host
+        started = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        timing['dns_ms'] = _ms(resolved - started)
+
+        last_error = None
+        for address in dict.fromkeys(info[4][0] for info in infos):
+            self._dns_host = address
+            try:
+                sock = super()._new_conn()
+                break
+            except NewConnectionError as e:
+                last_error = e
+            finally:
+                self._dns_host = dns_host
+        else:
+            raise last_error
+        timing['tcp_connect_ms'] = _ms(time.perf_counter() - resolved)
+        return sock
+
+
+class _CountingHTTPConnection(_CountingConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CountingHTTPSConnection(_CountingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CountingPoolMixin:
+    """Counts sockets actually opened, including reconnects of pooled connections"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sockets_opened = 0
+        self._connect_lock = threading.Lock()
+
+    def record_connect(self):
+        with self._connect_lock:
+            self.sockets_opened += 1
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.owner_pool = self
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+class PooledHTTPClient:
+    """requests.Session with explicit pool sizing and connection reuse stats.
+
+    ``pool_connections`` is the number of per-host pools kept alive and
+    ``pool_maxsize`` the number of sockets kept per host. With
+    ``pool_block`` the per-host limit is enforced: callers wait for a free
+    connection instead of opening (and then discarding) extra ones.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True):
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        # Tests against different targets must not leak cookies into each other
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self.adapter = _CountingHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def timed_request(self, method, url, **kwargs):
+        """Send a request and return (response, timing) with a phase breakdown.
+
+        DNS, TCP connect and TLS handshake are zero when a pooled connection
+        was reused. Time to first byte runs from sending the request (after
+        any connect) until the response headers arrived; the body is read
+        separately so its download time is measured on its own.
+        """
+        timing = {
+            'dns_ms': 0.0,
+            'tcp_connect_ms': 0.0,
+            'tls_handshake_ms': 0.0,
+            'connect_ms': 0.0,
+            'connection_reused': True,
+        }
+        _local.timing = timing
+        started = time.perf_counter()
+        try:
+            response = self.request(method, url, stream=True, **kwargs)
+            headers_received = time.perf_counter()
+            response.content
+            finished = time.perf_counter()
+        finally:
+            _local.timing = None
+
+        timing['time_to_first_byte_ms'] = round(max(_ms(headers_received - started) - timing['connect_ms'], 0.0), 3)
+        timing['body_download_ms'] = _ms(finished - headers_received)
+        timing['total_ms'] = _ms(finished - started)
+        return response, timing
+
+    def pool_stats(self, url=None):
+        """Connections opened vs. reused per host, optionally for one URL's host"""
+        target = None
+        if url:
+            parts = urlsplit(url)
+            target = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+
+        stats = []
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = (key.key_scheme, key.key_host, key.key_port or pool.port)
+            if target and host != target:
+                continue
+            stats.append({
+                'host': f'{host[0]}://{host[1]}:{host[2]}',
+                'connections_opened': pool.sockets_opened,
+                'requests': pool.num_requests,
+                'connections_reused': max(pool.num_requests - pool.sockets_opened, 0),
+                # The pool queue is pre-filled with None for slots never connected
+                'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+            })
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,92 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from unittest import mock
+from http_client import PooledHTTPClient
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_repeated_requests_reuse_one_connection(server_url):
+    client = PooledHTTPClient(pool_maxsize=2)
+    for _ in range(3):
+        assert client.request('GET', server_url, timeout=5).status_code == 200
+    [stats] = client.pool_stats(server_url)
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 2
+    assert stats['idle_connections'] == 1
+    client.close()
+
+
+def test_keep_alive_disabled_opens_a_connection_per_request(server_url):
+    client = PooledHTTPClient(keep_alive=False)
+    for _ in range(3):
+        client.request('GET', server_url, timeout=5)
+    [stats] = client.pool_stats(server_url)
+    assert stats['connections_opened'] == 3
+    client.close()
+
+
+def test_pool_stats_filters_by_host(server_url):
+    client = PooledHTTPClient()
+    client.request('GET', server_url, timeout=5)
+    assert client.pool_stats('http://example.invalid/') == []
+    assert len(client.pool_stats()) == 1
+    client.close()
+
+
+def test_timed_request_breaks_down_new_and_reused_connections(server_url):
+    client = PooledHTTPClient()
+    response, first = client.timed_request('GET', server_url, timeout=5)
+    assert response.content == b'ok'
+    assert first['connection_reused'] is False
+    assert first['connect_ms'] >= first['tcp_connect_ms'] > 0
+    assert first['total_ms'] >= first['time_to_first_byte_ms']
+
+    _, second = client.timed_request('GET', server_url, timeout=5)
+    assert second['connection_reused'] is True
+    assert second['dns_ms'] == second['tcp_connect_ms'] == second['connect_ms'] == 0.0
+    client.close()
+
+
+def test_timed_request_falls_back_across_resolved_addresses(server_url):
+    client = PooledHTTPClient()
+    port = int(server_url.rsplit(':', 1)[1].strip('/'))
+    real_getaddrinfo = socket.getaddrinfo
+
+    def fake_getaddrinfo(host, *args, **kwargs):
+        if host != 'test.invalid':
+            return real_getaddrinfo(host, *args, **kwargs)
+        # An address nothing listens on first, then the server
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.2', port)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port)),
+        ]
+
+    with mock.patch('socket.getaddrinfo', side_effect=fake_getaddrinfo):
+        response, timing = client.timed_request('GET', f'http://test.invalid:{port}/', timeout=5)
+    assert response.status_code == 200
+    client.close()
@@ -0,0 +1,467 @@
+"""Load generation for /test_api: concurrent senders and mergeable latency histograms"""
+import asyncio
+import itertools
+import math
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ARRIVAL_TYPES = ('constant', 'step', 'ramp', 'poisson')
+# A request starting this much after its scheduled time counts as a missed slot
+DEFAULT_SCHEDULE_TOLERANCE_MS = 5
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with bounded relative error.
+
+    Samples are not stored; each one increments a bucket whose width grows
+    geometrically, so memory stays constant regardless of the sample count
+    and percentiles are accurate to within ``precision`` (1% by default).
+    Histograms with the same precision can be merged by adding counts.
+    """
+
+    def __init__(self, precision=0.01):
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value_ms):
+        value_ms = max(value_ms, 0.001)
+        self.buckets[math.floor(math.log(value_ms) / self._log_base)] += 1
+        self.count += 1
+        self.total += value_ms
+        if self.min is None or value_ms < self.min:
+            self.min = value_ms
+        if self.max is None or value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge histograms with different precision')
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, percent):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                # Upper edge of the bucket, clamped to the observed range
+                value = math.exp((bucket + 1) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Serializable form, e.g. to ship a histogram between processes"""
+        return {
+            'precision': self.precision,
+            'buckets': dict(self.buckets),
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['precision'])
+        histogram.buckets.update({int(bucket): count for bucket, count in data['buckets'].items()})
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+    def summary(self):
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            'count': self.count,
+            'min': rounded(self.min),
+            'mean': rounded(self.total / self.count) if self.count else None,
+            'p50': rounded(self.percentile(50)),
+            'p90': rounded(self.percentile(90)),
+            'p99': rounded(self.percentile(99)),
+            'max': rounded(self.max),
+        }
+
+
+class WorkerStats:
+    """Latency histogram and status/exception counters of one sender"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.status_counts = Counter()
+        self.exceptions = Counter()
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.status_counts.update(other.status_counts)
+        self.exceptions.update(other.exceptions)
+        return self
+
+    def to_dict(self):
+        return {
+            'latency': self.latency.to_dict(),
+            'status_counts': dict(self.status_counts),
+            'exceptions': dict(self.exceptions),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latency = LatencyHistogram.from_dict(data['latency'])
+        stats.status_counts.update(data['status_counts'])
+        stats.exceptions.update(data['exceptions'])
+        return stats
+
+
+class ScheduleStats(WorkerStats):
+    """WorkerStats of an open-loop run, where latency counts from the scheduled start.
+
+    ``latency`` is measured from when the request was due, so time spent
+    waiting for a free sender is included; ``service`` is measured from
+    when it was actually sent and ``start_lag`` is the difference.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.service = LatencyHistogram()
+        self.start_lag = LatencyHistogram()
+        self.missed = 0
+        self.last_offset = 0.0
+
+    def record(self, intended, started, finished, tolerance):
+        lag = started - intended
+        self.latency.record((finished - intended) * 1000)
+        self.service.record((finished - started) * 1000)
+        self.start_lag.record(lag * 1000)
+        if lag > tolerance:
+            self.missed += 1
+
+    def merge(self, other):
+        super().merge(other)
+        self.service.merge(other.service)
+        self.start_lag.merge(other.start_lag)
+        self.missed += other.missed
+        self.last_offset = max(self.last_offset, other.last_offset)
+        return self
+
+    def to_dict(self):
+        data = super().to_dict()
+        data.update(service=self.service.to_dict(), start_lag=self.start_lag.to_dict(),
+                    missed=self.missed, last_offset=self.last_offset)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = super().from_dict(data)
+        stats.service = LatencyHistogram.from_dict(data['service'])
+        stats.start_lag = LatencyHistogram.from_dict(data['start_lag'])
+        stats.missed = data['missed']
+        stats.last_offset = data['last_offset']
+        return stats
+
+
+def _positive_number(value, allow_zero=False):
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    return value >= 0 if allow_zero else value > 0
+
+
+def validate_arrival(arrival):
+    """Check an open-loop arrival schedule; returns (normalized schedule, error).
+
+    ``{"type": "constant", "rate": 200}``: evenly spaced requests.
+    ``{"type": "step", "steps": [{"rate": 100, "duration_s": 10}, ...]}``:
+    piecewise constant; the last rate holds once the steps run out.
+    ``{"type": "ramp", "from_rate": 10, "to_rate": 500, "duration_s": 60}``:
+    linearly increasing rate, then ``to_rate``.
+    ``{"type": "poisson", "rate": 200, "seed": 1}``: exponential gaps.
+    ``tolerance_ms`` sets how late a start may be before it counts as missed.
+    """
+    if not isinstance(arrival, dict):
+        return None, 'arrival must be an object'
+    kind = arrival.get('type', 'constant')
+    if kind not in ARRIVAL_TYPES:
+        return None, f'arrival type must be one of {", ".join(ARRIVAL_TYPES)}'
+    normalized = {'type': kind}
+
+    if kind in ('constant', 'poisson'):
+        if not _positive_number(arrival.get('rate')):
+            return None, 'arrival rate must be a positive number'
+        normalized['rate'] = arrival['rate']
+    elif kind == 'step':
+        steps = arrival.get('steps')
+        if not isinstance(steps, list) or not steps:
+            return None, 'arrival steps must be a non-empty list'
+        normalized['steps'] = []
+        for step in steps:
+            if (not isinstance(step, dict) or not _positive_number(step.get('rate'))
+                    or not _positive_number(step.get('duration_s'))):
+                return None, 'each arrival step needs a positive rate and duration_s'
+            normalized['steps'].append({'rate': step['rate'], 'duration_s': step['duration_s']})
+    else:
+        if not _positive_number(arrival.get('from_rate', 0), allow_zero=True):
+            return None, 'arrival from_rate must be a non-negative number'
+        if not _positive_number(arrival.get('to_rate')) or not _positive_number(arrival.get('duration_s')):
+            return None, 'arrival ramp needs a positive to_rate and duration_s'
+        normalized.update(from_rate=arrival.get('from_rate', 0), to_rate=arrival['to_rate'],
+                          duration_s=arrival['duration_s'])
+
+    if kind == 'poisson':
+        seed = arrival.get('seed')
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+            return None, 'arrival seed must be an integer'
+        # Pick and report a seed so the exact schedule can be replayed
+        normalized['seed'] = seed if seed is not None else random.randrange(2 ** 32)
+
+    tolerance = arrival.get('tolerance_ms', DEFAULT_SCHEDULE_TOLERANCE_MS)
+    if not _positive_number(tolerance, allow_zero=True):
+        return None, 'arrival tolerance_ms must be a non-negative number'
+    normalized['tolerance_ms'] = tolerance
+    return normalized, None
+
+
+def initial_rate(arrival):
+    if arrival['type'] == 'step':
+        return arrival['steps'][0]['rate']
+    if arrival['type'] == 'ramp':
+        return arrival['from_rate'] or arrival['to_rate']
+    return arrival['rate']
+
+
+def scale_arrival(arrival, factor, phase_s=0.0, seed_offset=0):
+    """The share of a schedule one of several senders runs: rates times ``factor``"""
+    scaled = dict(arrival, phase_s=arrival.get('phase_s', 0.0) + phase_s)
+    for key in ('rate', 'from_rate', 'to_rate'):
+        if key in scaled:
+            scaled[key] = scaled[key] * factor
+    if 'steps' in scaled:
+        scaled['steps'] = [dict(step, rate=step['rate'] * factor) for step in scaled['steps']]
+    if 'seed' in scaled:
+        scaled['seed'] = scaled['seed'] + seed_offset
+    return scaled
+
+
+def arrival_offsets(arrival):
+    """Endless scheduled start times, in seconds from the start of the run"""
+    phase = arrival.get('phase_s', 0.0)
+    kind = arrival['type']
+    if kind == 'constant':
+        interval = 1.0 / arrival['rate']
+        for index in itertools.count():
+            yield phase + index * interval
+    elif kind == 'poisson':
+        generator = random.Random(arrival['seed'])
+        offset = phase
+        while True:
+            yield offset
+            offset += generator.expovariate(arrival['rate'])
+    elif kind == 'step':
+        step_start = phase
+        for position, step in enumerate(arrival['steps']):
+            last = position == len(arrival['steps']) - 1
+            step_end = step_start + step['duration_s']
+            for index in itertools.count():
+                offset = step_start + index / step['rate']
+                if offset >= step_end and not last:
+                    break
+                yield offset
+            step_start = step_end
+    else:
+        # Requests due by time t under a linear ramp: a*t + (b - a) * t^2 / (2 * D);
+        # invert it for the time of the n-th request
+        low, high, duration = arrival['from_rate'], arrival['to_rate'], arrival['duration_s']
+        ramp_requests = duration * (low + high) / 2
+        curvature = (high - low) / (2 * duration)
+        for index in itertools.count():
+            if index >= ramp_requests:
+                offset = duration + (index - ramp_requests) / high
+            elif curvature:
+                offset = (math.sqrt(low * low + 4 * curvature * index) - low) / (2 * curvature)
+            else:
+                offset = index / low
+            yield phase + offset
+
+
+def run_load_test(send, total_requests, concurrency, target_rps=None, arrival=None):
+    """Call ``send()`` ``total_requests`` times from ``concurrency`` threads.
+
+    ``send`` performs one request and returns its HTTP status code. With
+    ``target_rps`` the i-th request is not started before
+    ``start + i / target_rps``. With an ``arrival`` schedule (see
+    validate_arrival) the run is open-loop: requests are due at scheduled
+    times whether or not earlier ones finished, and latency counts from
+    the due time. Every worker aggregates into its own histogram and
+    counters, merged once the run finishes.
+    """
+    stats, duration = drive_threads(send, total_requests, concurrency, target_rps, arrival)
+    return summarize_stats(stats, duration, total_requests=total_requests, concurrency=concurrency,
+                           target_rps=target_rps, arrival=arrival)
+
+
+def drive_threads(send, total_requests, concurrency, target_rps=None, arrival=None):
+    """The thread runner behind run_load_test; returns (merged stats, duration)"""
+    next_index = iter(range(total_requests))
+    schedule = arrival_offsets(arrival) if arrival else None
+    index_lock = threading.Lock()
+    interval = 1.0 / target_rps if target_rps else 0.0
+    started = time.perf_counter()
+
+    def worker():
+        stats = ScheduleStats() if schedule else WorkerStats()
+        while True:
+            with index_lock:
+                index = next(next_index, None)
+                offset = next(schedule) if schedule and index is not None else None
+            if index is None:
+                return stats
+            if schedule:
+                _wait(started + offset - time.perf_counter())
+            elif interval:
+                delay = started + index * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            request_started = time.perf_counter()
+            try:
+                status = send()
+            except Exception as e:
+                stats.exceptions[type(e).__name__] += 1
+            else:
+                stats.status_counts[status] += 1
+            if schedule:
+                stats.record(started + offset, request_started, time.perf_counter(), arrival['tolerance_ms'] / 1000)
+                stats.last_offset = max(stats.last_offset, offset)
+            else:
+                stats.latency.record((time.perf_counter() - request_started) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        results = [future.result() for future in futures]
+    duration = time.perf_counter() - started
+
+    merged = ScheduleStats() if schedule else WorkerStats()
+    for stats in results:
+        merged.merge(stats)
+    return merged, duration
+
+
+def _wait(delay):
+    # Plain sleep, no spin-wait: with hundreds of sender threads spinning would
+    # burn the CPU the run needs. Any overshoot is reported as start lag.
+    if delay > 0:
+        time.sleep(delay)
+
+
+async def run_load_test_async(send, total_requests, concurrency, target_rps=None, progress=None, arrival=None):
+    """Event-loop counterpart of run_load_test: ``concurrency`` tasks on one thread.
+
+    ``send`` is a coroutine function returning the HTTP status code. All
+    tasks share one histogram, since nothing runs between their awaits.
+    ``progress``, if given, is called with the number of completed requests.
+    """
+    stats, duration = await drive_async(send, total_requests, concurrency, target_rps, progress, arrival)
+    return summarize_stats(stats, duration, total_requests=total_requests, concurrency=concurrency,
+                           target_rps=target_rps, arrival=arrival)
+
+
+async def drive_async(send, total_requests, concurrency, target_rps=None, progress=None, arrival=None):
+    """The task runner behind run_load_test_async; returns (stats, duration)"""
+    next_index = iter(range(total_requests))
+    schedule = arrival_offsets(arrival) if arrival else None
+    interval = 1.0 / target_rps if target_rps else 0.0
+    stats = ScheduleStats() if schedule else WorkerStats()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    # Scheduled times are kept on the perf_counter clock the latencies use
+    scheduled_from = time.perf_counter()
+
+    async def worker():
+        for index in next_index:
+            if schedule:
+                offset = next(schedule)
+                delay = scheduled_from + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif interval:
+                delay = started + index * interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            request_started = time.perf_counter()
+            try:
+                status = await send()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.exceptions[type(e).__name__] += 1
+            else:
+                stats.status_counts[status] += 1
+            if schedule:
+                stats.record(scheduled_from + offset, request_started, time.perf_counter(),
+                             arrival['tolerance_ms'] / 1000)
+                stats.last_offset = max(stats.last_offset, offset)
+            else:
+                stats.latency.record((time.perf_counter() - request_started) * 1000)
+            if progress is not None:
+                progress(stats.latency.count)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total_requests))))
+    return stats, loop.time() - started
+
+
+def summarize_stats(stats, duration, **settings):
+    """summarize() for a WorkerStats, adding the schedule report of an open-loop run"""
+    result = summarize(stats.latency, stats.status_counts, stats.exceptions, duration, **settings)
+    if isinstance(stats, ScheduleStats):
+        count = stats.latency.count
+        result['service_time_ms'] = stats.service.summary()
+        result['schedule'] = {
+            'planned_duration_s': round(stats.last_offset, 3),
+            'missed': stats.missed,
+            'missed_ratio': round(stats.missed / count, 4) if count else None,
+            'start_lag_ms': stats.start_lag.summary(),
+        }
+    return result
+
+
+def _succeeded(status):
+    # HTTP status codes, or gRPC status code names for gRPC runs
+    if isinstance(status, str):
+        return status == 'OK'
+    return 200 <= status < 300
+
+
+def summarize(latency, status_counts, exceptions, duration, **settings):
+    """Load-test result payload shared by every runner"""
+    completed = latency.count
+    failed = sum(count for status, count in status_counts.items() if not _succeeded(status))
+    failed += sum(exceptions.values())
+    return {
+        'settings': settings,
+        'duration_s': round(duration, 3),
+        'completed': completed,
+        'throughput_rps': round(completed / duration, 2) if duration > 0 else None,
+        'status_counts': {str(status): count for status, count in sorted(status_counts.items())},
+        'errors': {
+            'total': failed,
+            'exceptions': dict(exceptions),
+        },
+        'latency_ms': latency.summary(),
+    }
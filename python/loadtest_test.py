@@ -0,0 +1,152 @@
+import random
+import time
+import pytest
+from loadtest import LatencyHistogram, run_load_test
+
+
+def test_histogram_percentiles_within_precision():
+    histogram = LatencyHistogram()
+    samples = [random.uniform(1, 500) for _ in range(20000)]
+    for sample in samples:
+        histogram.record(sample)
+    samples.sort()
+    for percent in (50, 90, 99):
+        exact = samples[int(len(samples) * percent / 100) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.03)
+    assert histogram.max == samples[-1]
+    assert histogram.count == len(samples)
+
+
+def test_histogram_sub_millisecond_percentiles_within_precision():
+    histogram = LatencyHistogram()
+    for value in (0.3, 0.3, 0.3, 0.9):
+        histogram.record(value)
+    assert histogram.percentile(50) == pytest.approx(0.3, rel=0.01)
+    histogram = LatencyHistogram()
+    samples = sorted(random.uniform(0.01, 1) for _ in range(20000))
+    for sample in samples:
+        histogram.record(sample)
+    for percent in (10, 50, 90):
+        exact = samples[int(len(samples) * percent / 100) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.011)
+
+
+def test_histogram_merge_matches_single_histogram():
+    combined, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(1, 1001):
+        combined.record(value)
+        (left if value % 2 else right).record(value)
+    merged = LatencyHistogram.from_dict(left.to_dict()).merge(right)
+    assert merged.summary() == combined.summary()
+
+
+def test_run_load_test_counts_statuses_and_exceptions():
+    calls = iter(range(100))
+
+    def send():
+        index = next(calls)
+        if index % 10 == 0:
+            raise ConnectionError('refused')
+        return 500 if index % 10 == 1 else 200
+
+    result = run_load_test(send, total_requests=100, concurrency=4)
+    assert result['completed'] == 100
+    assert result['status_counts'] == {'200': 80, '500': 10}
+    assert result['errors'] == {'total': 20, 'exceptions': {'ConnectionError': 10}}
+    assert result['latency_ms']['count'] == 100
+
+
+def test_run_load_test_respects_target_rate():
+    result = run_load_test(lambda: 200, total_requests=20, concurrency=4, target_rps=100)
+    # 20 requests at 100/s take at least 190ms
+    assert result['duration_s'] >= 0.19
+
+
+def test_run_load_test_async_counts_statuses_and_reports_progress():
+    import asyncio
+    from loadtest import run_load_test_async
+    calls = iter(range(60))
+    progress = []
+
+    async def send():
+        await asyncio.sleep(0)
+        if next(calls) % 6 == 0:
+            raise TimeoutError()
+        return 204
+
+    result = asyncio.run(run_load_test_async(send, total_requests=60, concurrency=8, progress=progress.append))
+    assert result['status_counts'] == {'204': 50}
+    assert result['errors']['exceptions'] == {'TimeoutError': 10}
+    assert progress[-1] == 60
+
+
+def test_arrival_offsets_follow_each_schedule():
+    from itertools import islice
+    from loadtest import arrival_offsets, validate_arrival
+
+    def offsets(spec, count):
+        arrival, error = validate_arrival(spec)
+        assert error is None
+        return list(islice(arrival_offsets(arrival), count))
+
+    assert offsets({'type': 'constant', 'rate': 4}, 3) == [0.0, 0.25, 0.5]
+    # 10 requests in the first second at 10/s, then 100/s
+    step = offsets({'type': 'step', 'steps': [{'rate': 10, 'duration_s': 1}, {'rate': 100, 'duration_s': 1}]}, 200)
+    assert step[10] == pytest.approx(1.0) and step[109] == pytest.approx(1.99) and step[199] == pytest.approx(2.89)
+    # 0 -> 100/s over 2s schedules 100 requests, then holds 100/s
+    ramp = offsets({'type': 'ramp', 'from_rate': 0, 'to_rate': 100, 'duration_s': 2}, 200)
+    assert ramp[25] == pytest.approx(1.0) and ramp[100] == pytest.approx(2.0) and ramp[199] == pytest.approx(2.99)
+    poisson = offsets({'type': 'poisson', 'rate': 100, 'seed': 3}, 10000)
+    assert poisson == offsets({'type': 'poisson', 'rate': 100, 'seed': 3}, 10000)
+    assert poisson[-1] == pytest.approx(100, rel=0.05)
+
+
+def test_validate_arrival_rejects_bad_schedules():
+    from loadtest import validate_arrival
+    assert validate_arrival({'type': 'burst', 'rate': 1})[1]
+    assert validate_arrival({'type': 'constant', 'rate': 0})[1]
+    assert validate_arrival({'type': 'step', 'steps': [{'rate': 10}]})[1]
+    assert validate_arrival({'type': 'ramp', 'from_rate': 5, 'duration_s': 1})[1]
+    arrival, error = validate_arrival({'type': 'poisson', 'rate': 5})
+    assert error is None and isinstance(arrival['seed'], int)
+
+
+def test_open_loop_counts_latency_from_scheduled_start():
+    import itertools
+    from loadtest import validate_arrival
+    arrival, _ = validate_arrival({'type': 'constant', 'rate': 200})
+    calls = itertools.count()
+
+    def send():
+        # One 300ms stall on a single sender delays every request due meanwhile
+        time.sleep(0.3 if next(calls) == 20 else 0)
+        return 200
+
+    closed = run_load_test(send, total_requests=200, concurrency=1, target_rps=200)
+    calls = itertools.count()
+    result = run_load_test(send, total_requests=200, concurrency=1, arrival=arrival)
+    assert result['completed'] == 200
+    # Closed-loop pacing hides the stall behind a single slow sample
+    assert closed['latency_ms']['p90'] < 50
+    assert result['latency_ms']['p90'] > 100
+    assert result['service_time_ms']['p90'] < 50
+    assert result['schedule']['missed'] >= 50
+    assert result['schedule']['planned_duration_s'] == pytest.approx(0.995)
+
+
+def test_open_loop_async_reports_schedule():
+    import asyncio
+    from loadtest import run_load_test_async, validate_arrival
+    # A generous tolerance keeps the missed count independent of how busy the machine is
+    arrival, _ = validate_arrival({'type': 'poisson', 'rate': 500, 'seed': 7, 'tolerance_ms': 1000})
+
+    async def send():
+        await asyncio.sleep(0.001)
+        return 200
+
+    result = asyncio.run(run_load_test_async(send, total_requests=100, concurrency=20, arrival=arrival))
+    assert result['status_counts'] == {'200': 100}
+    assert result['settings']['arrival']['seed'] == 7
+    assert result['schedule']['missed'] == 0
+    assert result['schedule']['start_lag_ms']['count'] == 100
+    assert result['latency_ms']['min'] >= result['service_time_ms']['min']
@@ -0,0 +1,147 @@
+"""In-memory index of the message types defined by the loaded proto files"""
+import threading
+from google.protobuf import descriptor_pb2
+from google.protobuf import message_factory
+
+
+class MessageRegistry:
+    """Maps message names to message classes across all loaded proto files.
+
+    Every message (including nested ones) is indexed by its fully qualified
+    name and by each dotted suffix of it, so ``pkg.Outer.Inner``,
+    ``Outer.Inner`` and ``Inner`` all resolve in a single dict lookup.
+    A name may also be pinned to one file as ``file.proto:Name``.
+    RPC methods are indexed the same way as ``pkg.Service/Method``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # proto filename -> {full name: (message class, descriptor fingerprint)}
+        self._files = {}
+        # proto filename -> {"pkg.Service/Method": MethodDescriptor}
+        self._methods = {}
+        # proto filename -> load error
+        self._errors = {}
+        # name (or dotted suffix) -> set of full names
+        self._aliases = {}
+        # resolved lookups, rebuilt lazily after every change
+        self._resolved = {}
+
+    def register_module(self, proto_filename, module):
+        """Index every message type of a loaded module, replacing older entries"""
+        types = {}
+        for descriptor in module.DESCRIPTOR.message_types_by_name.values():
+            self._collect(descriptor, types)
+        methods = {
+            f'{service.full_name}/{method.name}': method
+            for service in module.DESCRIPTOR.services_by_name.values()
+            for method in service.methods
+        }
+        with self._lock:
+            self._files[proto_filename] = types
+            self._methods[proto_filename] = methods
+            self._errors.pop(proto_filename, None)
+            self._rebuild_aliases()
+        return sorted(types)
+
+    def register_error(self, proto_filename, error):
+        """Record a file that could not be loaded and drop its old entries"""
+        with self._lock:
+            self._files.pop(proto_filename, None)
+            self._methods.pop(proto_filename, None)
+            self._errors[proto_filename] = error
+            self._rebuild_aliases()
+
+    def unregister(self, proto_filename):
+        with self._lock:
+            self._files.pop(proto_filename, None)
+            self._methods.pop(proto_filename, None)
+            self._errors.pop(proto_filename, None)
+            self._rebuild_aliases()
+
+    def resolve(self, message_type):
+        """Return (message_class, error) for a short, nested or qualified name"""
+        resolved = self._resolved.get(message_type)
+        if resolved is None:
+            with self._lock:
+                resolved = self._resolve_locked(message_type)
+                if resolved[0] is not None:
+                    self._resolved[message_type] = resolved
+        return resolved
+
+    def list_types(self):
+        """Fully qualified message names grouped by proto file"""
+        with self._lock:
+            return {filename: sorted(types) for filename, types in self._files.items()}
+
+    def list_methods(self):
+        """RPC methods (``pkg.Service/Method``) grouped by proto file"""
+        with self._lock:
+            return {filename: sorted(methods) for filename, methods in self._methods.items()}
+
+    def resolve_method(self, rpc):
+        """Return (MethodDescriptor, error) for ``pkg.Service/Method`` or a shorter suffix"""
+        name = rpc.lstrip('/')
+        if '/' not in name:
+            return None, f'RPC {rpc} must be given as Service/Method'
+        with self._lock:
+            candidates = {
+                path: method
+                for methods in self._methods.values()
+                for path, method in methods.items()
+                if path == name or path.endswith('.' + name)
+            }
+        if not candidates:
+            return None, f'RPC {rpc} not found'
+        if len(candidates) > 1:
+            return None, f'RPC {rpc} is ambiguous, candidates: {", ".join(sorted(candidates))}'
+        return next(iter(candidates.values())), None
+
+    def load_errors(self):
+        with self._lock:
+            return dict(self._errors)
+
+    def _collect(self, descriptor, types):
+        if descriptor.GetOptions().map_entry:
+            return
+        proto = descriptor_pb2.DescriptorProto()
+        descriptor.CopyToProto(proto)
+        fingerprint = proto.SerializeToString(deterministic=True)
+        types[descriptor.full_name] = (message_factory.GetMessageClass(descriptor), fingerprint)
+        for nested in descriptor.nested_types:
+            self._collect(nested, types)
+
+    def _rebuild_aliases(self):
+        aliases = {}
+        for types in self._files.values():
+            for full_name in types:
+                parts = full_name.split('.')
+                for i in range(len(parts)):
+                    aliases.setdefault('.'.join(parts[i:]), set()).add(full_name)
+        self._aliases = aliases
+        self._resolved = {}
+
+    def _resolve_locked(self, message_type):
+        name = message_type.lstrip('.')
+        filenames = sorted(self._files)
+        if ':' in name:
+            pinned_file, name = name.split(':', 1)
+            filenames = [pinned_file] if pinned_file in self._files else []
+
+        candidates = []
+        for full_name in sorted(self._aliases.get(name, ())):
+            for filename in filenames:
+                entry = self._files[filename].get(full_name)
+                if entry:
+                    candidates.append((filename, full_name, entry))
+
+        if not candidates:
+            return None, f'Message type {message_type} not found'
+
+        # The same definition compiled from several files is not ambiguous
+        fingerprints = {(full_name, entry[1]) for _, full_name, entry in candidates}
+        if len(fingerprints) > 1:
+            matches = ', '.join(f'{filename}:{full_name}' for filename, full_name, _ in candidates)
+            return None, f'Message type {message_type} is ambiguous, candidates: {matches}'
+
+        return candidates[0][2][0], None
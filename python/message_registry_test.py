@@ -0,0 +1,85 @@
+import types
+from google.protobuf import descriptor_pb2
+from google.protobuf import descriptor_pool
+from message_registry import MessageRegistry
+
+
+def make_module(filename, package, messages):
+    """Build a module-like object from {message name: [nested names]}"""
+    file_proto = descriptor_pb2.FileDescriptorProto(name=filename, package=package, syntax='proto3')
+    for name, nested in messages.items():
+        message = file_proto.message_type.add(name=name)
+        message.field.add(name='id', number=1, type=descriptor_pb2.FieldDescriptorProto.TYPE_STRING,
+                          label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL)
+        for nested_name in nested:
+            message.nested_type.add(name=nested_name)
+    pool = descriptor_pool.DescriptorPool()
+    module = types.ModuleType(filename.replace('.proto', '_pb2'))
+    module.DESCRIPTOR = pool.Add(file_proto)
+    return module
+
+
+def test_resolves_qualified_nested_and_short_names():
+    registry = MessageRegistry()
+    registry.register_module('shop.proto', make_module('shop.proto', 'shop.v1', {'Order': ['Item']}))
+
+    order_class, error = registry.resolve('Order')
+    assert error is None
+    assert order_class.DESCRIPTOR.full_name == 'shop.v1.Order'
+    assert registry.resolve('shop.v1.Order')[0] is order_class
+    assert registry.resolve('Order.Item')[0].DESCRIPTOR.full_name == 'shop.v1.Order.Item'
+    assert registry.list_types() == {'shop.proto': ['shop.v1.Order', 'shop.v1.Order.Item']}
+
+
+def test_reports_ambiguous_names_across_files():
+    registry = MessageRegistry()
+    registry.register_module('a.proto', make_module('a.proto', 'a', {'Event': []}))
+    registry.register_module('b.proto', make_module('b.proto', 'b', {'Event': []}))
+
+    message_class, error = registry.resolve('Event')
+    assert message_class is None
+    assert 'ambiguous' in error
+    assert 'a.proto:a.Event' in error and 'b.proto:b.Event' in error
+    assert registry.resolve('b.Event')[0].DESCRIPTOR.full_name == 'b.Event'
+    assert registry.resolve('a.proto:Event')[0].DESCRIPTOR.full_name == 'a.Event'
+
+
+def test_identical_definitions_are_not_ambiguous():
+    registry = MessageRegistry()
+    registry.register_module('sample.proto', make_module('sample.proto', '', {'UserRequest': []}))
+    registry.register_module('test.proto', make_module('test.proto', '', {'UserRequest': []}))
+
+    message_class, error = registry.resolve('UserRequest')
+    assert error is None
+    assert message_class.DESCRIPTOR.file.name == 'sample.proto'
+
+
+def test_reregistering_a_file_replaces_its_types():
+    registry = MessageRegistry()
+    registry.register_module('a.proto', make_module('a.proto', 'a', {'Old': []}))
+    assert registry.resolve('Old')[0] is not None
+
+    registry.register_error('a.proto', 'broken')
+    assert registry.resolve('Old')[0] is None
+    assert registry.load_errors() == {'a.proto': 'broken'}
+
+
+def test_resolves_rpc_methods_by_suffix():
+    file_proto = descriptor_pb2.FileDescriptorProto(name='shop.proto', package='shop.v1', syntax='proto3')
+    file_proto.message_type.add(name='Order')
+    service = file_proto.service.add(name='Orders')
+    service.method.add(name='Get', input_type='.shop.v1.Order', output_type='.shop.v1.Order')
+    module = types.ModuleType('shop_pb2')
+    module.DESCRIPTOR = descriptor_pool.DescriptorPool().Add(file_proto)
+    registry = MessageRegistry()
+    registry.register_module('shop.proto', module)
+
+    assert registry.list_methods() == {'shop.proto': ['shop.v1.Orders/Get']}
+    for name in ('shop.v1.Orders/Get', '/shop.v1.Orders/Get', 'Orders/Get', 'v1.Orders/Get'):
+        method, error = registry.resolve_method(name)
+        assert error is None and method.full_name == 'shop.v1.Orders.Get'
+    assert 'not found' in registry.resolve_method('Orders/Put')[1]
+    assert 'Service/Method' in registry.resolve_method('Get')[1]
+
+    registry.unregister('shop.proto')
+    assert registry.resolve_method('Orders/Get')[0] is None
@@ -0,0 +1,285 @@
+"""In-process counters, gauges and histograms rendered in the Prometheus text format"""
+import bisect
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; the Prometheus client defaults, for request-sized work
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+# Seconds; for per-message work such as JSON conversion
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+
+class _ThreadCells:
+    """Per-thread accumulators summed on collection.
+
+    Each thread only ever adds to its own list, so recording takes no lock
+    and cannot lose updates. Lists of finished threads are folded into
+    ``_retired`` whenever a new thread starts recording or totals are
+    read, so short-lived request threads do not accumulate.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._cells = {}
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def cell(self):
+        cell = getattr(self._local, 'cell', None)
+        if cell is None:
+            cell = [0] * self.size
+            with self._lock:
+                self._fold_finished()
+                self._cells[threading.current_thread()] = cell
+            self._local.cell = cell
+        return cell
+
+    def _fold_finished(self):
+        for thread in [thread for thread in self._cells if not thread.is_alive()]:
+            for index, value in enumerate(self._cells.pop(thread)):
+                self._retired[index] += value
+
+    def totals(self):
+        with self._lock:
+            self._fold_finished()
+            totals = list(self._retired)
+            for cell in self._cells.values():
+                for index, value in enumerate(cell):
+                    totals[index] += value
+        return totals
+
+
+class _Timer:
+    """``with histogram.time():`` observes the block's duration in seconds"""
+
+    __slots__ = ('_histogram', '_started')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class CounterChild:
+    def __init__(self, metric):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError('Counters can only increase')
+        self._cells.cell()[0] += amount
+
+    def value(self):
+        return self._cells.totals()[0]
+
+    def samples(self, name):
+        return [(name, (), self.value())]
+
+
+class GaugeChild:
+    def __init__(self, metric):
+        self._function = metric.function
+        self._cells = _ThreadCells(1)
+        # set() moves the value by this offset, since other threads' cells cannot be reset
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    def dec(self, amount=1):
+        self._cells.cell()[0] -= amount
+
+    def set(self, value):
+        with self._lock:
+            self._offset = value - self._cells.totals()[0]
+
+    def value(self):
+        if self._function is not None:
+            return self._function()
+        return self._offset + self._cells.totals()[0]
+
+    def samples(self, name):
+        return [(name, (), self.value())]
+
+
+class HistogramChild:
+    def __init__(self, metric):
+        self._bounds = metric.buckets
+        # One count per bucket (the last one is +Inf), then the sum
+        self._cells = _ThreadCells(len(self._bounds) + 2)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self._bounds, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name):
+        totals = self._cells.totals()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self._bounds + (math.inf,), totals):
+            cumulative += count
+            samples.append((f'{name}_bucket', (('le', _format_value(bound)),), cumulative))
+        samples.append((f'{name}_sum', (), totals[-1]))
+        samples.append((f'{name}_count', (), cumulative))
+        return samples
+
+
+class Metric:
+    """A named metric with one child per combination of label values"""
+
+    kind = None
+    child_class = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Label values as passed (e.g. 200) -> child, so look-ups skip converting them
+        self._children = {}
+        # Label values as strings -> child; what collect() renders
+        self._series = {}
+        self._lock = threading.Lock()
+        # Unlabelled metrics record straight into their only child
+        self._default = None if self.labelnames else self.labels()
+
+    def labels(self, *values, **labels):
+        """The child for these label values (positional, or by label name)"""
+        if labels:
+            values = tuple(labels[name] for name in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} takes labels {self.labelnames}, got {values}')
+            key = tuple(map(str, values))
+            with self._lock:
+                child = self._series.get(key)
+                if child is None:
+                    child = self._series[key] = self.child_class(self)
+                self._children[values] = child
+        return child
+
+    def collect(self):
+        """(sample name, label pairs, value) for every child"""
+        with self._lock:
+            series = sorted(self._series.items())
+        samples = []
+        for values, child in series:
+            labels = tuple(zip(self.labelnames, values))
+            for name, extra, value in child.samples(self.name):
+                samples.append((name, labels + extra, value))
+        return samples
+
+
+class Counter(Metric):
+    kind = 'counter'
+    child_class = CounterChild
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    child_class = GaugeChild
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        # Read by the children, so set before Metric creates the default one
+        self.function = function
+        super().__init__(name, documentation, labelnames)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    child_class = HistogramChild
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(float(value))
+
+
+def _escape_label(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class Registry:
+    """The metrics of one process, rendered together by ``exposition()``"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        """A gauge set by inc/dec/set, or read from ``function()`` at collection"""
+        return self._add(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def exposition(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            documentation = metric.documentation.replace('\\', r'\\').replace('\n', r'\n')
+            lines.append(f'# HELP {metric.name} {documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.collect():
+                if labels:
+                    rendered = ','.join(f'{label}="{_escape_label(text)}"' for label, text in labels)
+                    name = f'{name}{{{rendered}}}'
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from metrics import Registry
+
+
+def sample_lines(registry, prefix):
+    return [line for line in registry.exposition().splitlines() if line.startswith(prefix)]
+
+
+def test_counters_sum_every_thread_including_finished_ones():
+    registry = Registry()
+    counter = registry.counter('jobs_total', 'Jobs', ('kind',))
+
+    def work():
+        for _ in range(10000):
+            counter.labels('a').inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.labels(kind='a').inc()
+    assert counter.labels('a').value() == 80001
+    # Cells of finished threads are folded away instead of kept per thread
+    assert len(counter.labels('a')._cells._cells) == 1
+
+    with pytest.raises(ValueError):
+        counter.labels('a').inc(-1)
+
+
+def test_label_values_render_as_one_series_regardless_of_type():
+    registry = Registry()
+    counter = registry.counter('responses_total', 'Responses', ('status',))
+    counter.labels(200).inc()
+    counter.labels('200').inc()
+    counter.labels(status='5"0\\0\n').inc()
+    assert sample_lines(registry, 'responses_total') == [
+        'responses_total{status="200"} 2',
+        'responses_total{status="5\\"0\\\\0\\n"} 1',
+    ]
+    with pytest.raises(ValueError):
+        counter.labels('200', 'extra')
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+    with histogram.time():
+        pass
+    lines = sample_lines(registry, 'latency_seconds')
+    assert lines[:3] == [
+        'latency_seconds_bucket{le="0.1"} 3',
+        'latency_seconds_bucket{le="1"} 4',
+        'latency_seconds_bucket{le="+Inf"} 5',
+    ]
+    assert float(lines[3].split()[1]) == pytest.approx(3.65, abs=0.01)
+    assert lines[4] == 'latency_seconds_count 5'
+
+
+def test_gauges_and_exposition_headers():
+    registry = Registry()
+    gauge = registry.gauge('in_flight', 'In flight')
+    gauge.inc(3)
+    gauge.dec()
+    thread = threading.Thread(target=gauge.inc)
+    thread.start()
+    thread.join()
+    assert gauge.labels().value() == 3
+    gauge.set(10)
+    registry.gauge('modules', 'Loaded\nmodules', function=lambda: 7)
+    assert registry.exposition() == (
+        '# HELP in_flight In flight\n'
+        '# TYPE in_flight gauge\n'
+        'in_flight 10\n'
+        '# HELP modules Loaded\\nmodules\n'
+        '# TYPE modules gauge\n'
+        'modules 7\n'
+    )
+    with pytest.raises(ValueError):
+        registry.counter('modules', 'Again')
@@ -0,0 +1,116 @@
+"""Pre-encoded request bodies in one contiguous buffer, optionally memory-mapped from disk"""
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+_MAGIC = b'PBCORPUS'
+_VERSION = 1
+# magic, format version, payload count, metadata length; offsets and data follow
+_HEADER = struct.Struct('<8sIQI')
+
+
+def _little_endian(offsets):
+    if sys.byteorder == 'big':
+        offsets = array('Q', offsets)
+        offsets.byteswap()
+    return offsets
+
+
+class PayloadCorpus:
+    """N encoded payloads stored back to back, with an offsets array.
+
+    Payload ``i`` is ``buffer[offsets[i]:offsets[i + 1]]``, so a corpus costs
+    one buffer plus 8 bytes per payload instead of one Python object each.
+    Payloads are encoded once, when the corpus is built; senders only slice.
+    A saved corpus is memory-mapped on load, so the OS page cache shares it
+    between runs and processes.
+    """
+
+    def __init__(self, buffer, offsets, metadata=None, base=0, path=None):
+        self._buffer = buffer
+        self._offsets = offsets
+        # Start of the payload data within buffer (past the header of a mapped file)
+        self._base = base
+        self.metadata = metadata or {}
+        # File a mapped corpus came from; other processes map it again instead of copying
+        self.path = path
+        self._counter = itertools.count()
+
+    def __reduce__(self):
+        if self.path is not None:
+            return PayloadCorpus.load, (self.path,)
+        return PayloadCorpus, (self._buffer, self._offsets, self.metadata)
+
+    @classmethod
+    def build(cls, payloads, metadata=None):
+        """Concatenate encoded payloads (bytes) into a new in-memory corpus"""
+        buffer = bytearray()
+        offsets = array('Q', [0])
+        for payload in payloads:
+            buffer += payload
+            offsets.append(len(buffer))
+        return cls(bytes(buffer), offsets, metadata)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self._offsets[-1]
+
+    def __getitem__(self, index):
+        return self._buffer[self._base + self._offsets[index]:self._base + self._offsets[index + 1]]
+
+    def start_at(self, index):
+        """Make next_payload() continue from payload ``index``"""
+        self._counter = itertools.count(index)
+
+    def next_payload(self):
+        """Payloads in order, wrapping around; safe to call from many threads"""
+        # next() on itertools.count is atomic under the GIL
+        return self[next(self._counter) % len(self)]
+
+    def save(self, path):
+        """Write the corpus to ``path`` atomically, in the format load() maps"""
+        metadata = json.dumps(self.metadata).encode('utf-8')
+        # Per-writer temp file, so concurrent saves of one corpus never interleave
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(self), len(metadata)))
+            f.write(metadata)
+            f.write(_little_endian(self._offsets).tobytes())
+            f.write(memoryview(self._buffer)[self._base:self._base + self.nbytes])
+        os.replace(temp_path, path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a saved corpus; raises ValueError if it is not one"""
+        with open(path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f'{path} is empty')
+        if len(mapped) < _HEADER.size:
+            raise ValueError(f'{path} is not a payload corpus')
+        magic, version, count, metadata_length = _HEADER.unpack_from(mapped)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a payload corpus')
+        if version != _VERSION:
+            raise ValueError(f'{path} has unsupported corpus version {version}')
+
+        position = _HEADER.size
+        metadata = json.loads(mapped[position:position + metadata_length])
+        position += metadata_length
+        offsets = array('Q')
+        offsets.frombytes(mapped[position:position + offsets.itemsize * (count + 1)])
+        offsets = _little_endian(offsets)
+        position += offsets.itemsize * (count + 1)
+        if len(offsets) != count + 1 or position + offsets[-1] > len(mapped):
+            raise ValueError(f'{path} is truncated')
+        return cls(mapped, offsets, metadata, base=position, path=path)
@@ -0,0 +1,61 @@
+import pytest
+from payload_corpus import PayloadCorpus
+
+
+def test_build_slices_payloads_and_cycles():
+    corpus = PayloadCorpus.build([b'one', b'', b'three'], {'message_type': 'UserRequest'})
+    assert len(corpus) == 3
+    assert corpus.nbytes == 8
+    assert [corpus[i] for i in range(3)] == [b'one', b'', b'three']
+    assert [corpus.next_payload() for _ in range(4)] == [b'one', b'', b'three', b'one']
+
+
+def test_saved_corpus_is_memory_mapped_back(tmp_path):
+    path = str(tmp_path / 'users.corpus')
+    payloads = [bytes([i]) * i for i in range(1, 200)]
+    PayloadCorpus.build(payloads, {'seed': 7}).save(path)
+
+    corpus = PayloadCorpus.load(path)
+    assert corpus.metadata == {'seed': 7}
+    assert [corpus[i] for i in range(len(corpus))] == payloads
+
+
+def test_load_rejects_foreign_and_truncated_files(tmp_path):
+    other = tmp_path / 'other.bin'
+    other.write_bytes(b'not a corpus at all, just some bytes')
+    with pytest.raises(ValueError):
+        PayloadCorpus.load(str(other))
+
+    path = tmp_path / 'cut.corpus'
+    PayloadCorpus.build([b'x' * 100]).save(str(path))
+    path.write_bytes(path.read_bytes()[:-10])
+    with pytest.raises(ValueError):
+        PayloadCorpus.load(str(path))
+
+
+def test_pickled_corpus_keeps_payloads_and_maps_files_again(tmp_path):
+    import pickle
+    corpus = PayloadCorpus.build([b'a', b'bb'])
+    assert [pickle.loads(pickle.dumps(corpus))[i] for i in range(2)] == [b'a', b'bb']
+
+    path = str(tmp_path / 'c.corpus')
+    corpus.save(path)
+    mapped = pickle.loads(pickle.dumps(PayloadCorpus.load(path)))
+    assert mapped.path == path
+    mapped.start_at(1)
+    assert [mapped.next_payload() for _ in range(3)] == [b'bb', b'a', b'bb']
+
+
+def test_concurrent_saves_never_leave_a_torn_file(tmp_path):
+    import threading
+    path = str(tmp_path / 'shared.corpus')
+    corpora = [PayloadCorpus.build([bytes([i]) * 50000] * 20) for i in range(8)]
+    threads = [threading.Thread(target=corpus.save, args=(path,)) for corpus in corpora]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    saved = PayloadCorpus.load(path)
+    assert len(saved) == 20
+    assert len({saved[i] for i in range(len(saved))}) == 1
+    assert [entry.name for entry in tmp_path.iterdir()] == ['shared.corpus']
@@ -0,0 +1,176 @@
+"""Load runs sharded across worker processes, each driving its own event loop"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import loadtest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# How long workers may take to start before the run is abandoned
+STARTUP_TIMEOUT = 60
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split(total, parts):
+    """Split ``total`` into ``parts`` integers differing by at most one"""
+    share, remainder = divmod(total, parts)
+    return [share + (1 if index < remainder else 0) for index in range(parts)]
+
+
+def _pin(cpu):
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        return None
+    os.sched_setaffinity(0, {cpu})
+    return cpu
+
+
+async def _drive_with_aiohttp(shard):
+    connector = aiohttp.TCPConnector(limit=shard['concurrency'], limit_per_host=0)
+    timeout = aiohttp.ClientTimeout(total=shard['timeout'])
+    corpus = shard['corpus']
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     cookie_jar=aiohttp.DummyCookieJar()) as session:
+        async def send():
+            body = corpus.next_payload() if corpus is not None else None
+            async with session.request(shard['method'], shard['api_url'], headers=shard['headers'], data=body) as response:
+                await response.read()
+                return response.status
+
+        return await loadtest.drive_async(send, shard['total_requests'], shard['concurrency'], shard['target_rps'],
+                                          arrival=shard['arrival'])
+
+
+def _drive_with_requests(shard):
+    # Without aiohttp every process falls back to the threaded sender
+    from http_client import PooledHTTPClient
+    client = PooledHTTPClient(pool_connections=1, pool_maxsize=shard['concurrency'], pool_block=True)
+    corpus = shard['corpus']
+
+    def send():
+        body = corpus.next_payload() if corpus is not None else None
+        return client.request(shard['method'], shard['api_url'], headers=shard['headers'], data=body,
+                              timeout=shard['timeout']).status_code
+
+    try:
+        return loadtest.drive_threads(send, shard['total_requests'], shard['concurrency'], shard['target_rps'],
+                                      shard['arrival'])
+    finally:
+        client.close()
+
+
+def _worker_main(index, shard, start_barrier, results):
+    try:
+        cpu = _pin(shard['cpu'])
+        if shard['corpus'] is not None:
+            # Spread the workers over the corpus instead of all sending payload 0 first
+            shard['corpus'].start_at(index * len(shard['corpus']) // shard['processes'])
+        start_barrier.wait(STARTUP_TIMEOUT)
+        if aiohttp is not None:
+            stats, duration = asyncio.run(_drive_with_aiohttp(shard))
+        else:
+            stats, duration = _drive_with_requests(shard)
+        results.put((index, {'pid': os.getpid(), 'cpu': cpu, 'duration': duration, 'stats': stats.to_dict()}, None))
+    except BaseException as e:
+        # Release the other workers if this one never reached the barrier
+        start_barrier.abort()
+        results.put((index, None, f'{type(e).__name__}: {e}'))
+
+
+def run_process_load_test(api_url, method, headers, corpus, total_requests, concurrency,
+                          target_rps=None, processes=None, pin_cpus=False, timeout=30, arrival=None):
+    """Shard a load run over ``processes`` workers and merge their results.
+
+    Requests, senders and the target rate are split evenly; each worker runs
+    its share on its own event loop (aiohttp) or, without aiohttp, its own
+    thread pool. Workers wait on a barrier so they start sending together,
+    then return their latency histogram and counters, which are merged into
+    the usual load-test result plus a per-process breakdown. With
+    ``pin_cpus`` worker ``i`` is pinned to the i-th available CPU (Linux).
+    An ``arrival`` schedule is split the same way, with worker ``i`` shifted
+    by ``i`` request slots so the workers interleave instead of firing
+    together (Poisson workers get distinct seeds instead).
+    """
+    cpus = available_cpus()
+    processes = max(1, min(processes or len(cpus), total_requests, concurrency))
+    request_shares = split(total_requests, processes)
+    concurrency_shares = split(concurrency, processes)
+
+    # spawn, not fork: the parent has live threads (engine loop, connection pools)
+    context = multiprocessing.get_context('spawn')
+    start_barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = []
+    for index in range(processes):
+        share = request_shares[index] / total_requests
+        shard_arrival = None
+        if arrival:
+            phase = 0.0 if arrival['type'] == 'poisson' else index / loadtest.initial_rate(arrival)
+            shard_arrival = loadtest.scale_arrival(arrival, share, phase_s=phase, seed_offset=index)
+        shard = {
+            'api_url': api_url,
+            'method': method,
+            'headers': headers,
+            'corpus': corpus,
+            'total_requests': request_shares[index],
+            'concurrency': concurrency_shares[index],
+            'target_rps': target_rps * share if target_rps else None,
+            'arrival': shard_arrival,
+            'timeout': timeout,
+            'processes': processes,
+            'cpu': cpus[index % len(cpus)] if pin_cpus else None,
+        }
+        worker = context.Process(target=_worker_main, args=(index, shard, start_barrier, results), daemon=True)
+        worker.start()
+        workers.append(worker)
+
+    stats_class = loadtest.ScheduleStats if arrival else loadtest.WorkerStats
+    merged = stats_class()
+    per_process = [None] * processes
+    errors = []
+    started = time.perf_counter()
+    try:
+        for _ in range(processes):
+            # Generous bound: startup plus every request timing out back to back
+            remaining = STARTUP_TIMEOUT + timeout * max(request_shares) - (time.perf_counter() - started)
+            try:
+                index, report, error = results.get(timeout=max(remaining, 1))
+            except queue.Empty:
+                errors.append('Timed out waiting for load workers')
+                break
+            if error:
+                errors.append(f'worker {index}: {error}')
+                continue
+            stats = stats_class.from_dict(report['stats'])
+            merged.merge(stats)
+            per_process[index] = {
+                'worker': index,
+                'pid': report['pid'],
+                'cpu': report['cpu'],
+                'completed': stats.latency.count,
+                'duration_s': round(report['duration'], 3),
+                'throughput_rps': round(stats.latency.count / report['duration'], 2) if report['duration'] > 0 else None,
+            }
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    # Workers start together, so the slowest one bounds the run
+    duration = max((report['duration_s'] for report in per_process if report), default=0.0)
+    result = loadtest.summarize_stats(merged, duration, total_requests=total_requests, concurrency=concurrency,
+                                      target_rps=target_rps, arrival=arrival, processes=processes, pin_cpus=pin_cpus)
+    result['processes'] = [report for report in per_process if report]
+    if errors:
+        result['errors']['workers'] = errors
+    return result
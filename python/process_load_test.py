@@ -0,0 +1,63 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from payload_corpus import PayloadCorpus
+from process_load import run_process_load_test, split
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    bodies = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.lock:
+            self.bodies.append(body)
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    CountingHandler.bodies = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_split_spreads_the_remainder():
+    assert split(10, 3) == [4, 3, 3]
+    assert sum(split(7, 7)) == 7
+
+
+def test_process_shards_are_merged_into_one_result(server_url):
+    corpus = PayloadCorpus.build([b'a', b'b', b'c', b'd'])
+    result = run_process_load_test(server_url, 'POST', {}, corpus, total_requests=120, concurrency=4,
+                                   processes=2, pin_cpus=True)
+
+    assert result['completed'] == 120
+    assert result['status_counts'] == {'202': 120}
+    assert result['latency_ms']['count'] == 120
+    assert [worker['completed'] for worker in result['processes']] == [60, 60]
+    assert len({worker['pid'] for worker in result['processes']}) == 2
+    # Each worker starts at its own offset, so every payload is sent
+    assert sorted(set(CountingHandler.bodies)) == [b'a', b'b', b'c', b'd']
+
+
+def test_process_shards_split_an_arrival_schedule(server_url):
+    from loadtest import validate_arrival
+    arrival, _ = validate_arrival({'type': 'constant', 'rate': 400})
+    result = run_process_load_test(server_url, 'POST', {}, PayloadCorpus.build([b'a']), total_requests=80,
+                                   concurrency=4, processes=2, arrival=arrival)
+
+    assert result['completed'] == 80
+    # Each worker runs 200/s, the second half a slot behind the first
+    assert result['schedule']['planned_duration_s'] == pytest.approx(0.1975, abs=0.001)
+    assert result['service_time_ms']['count'] == 80
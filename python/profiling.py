@@ -0,0 +1,237 @@
+"""Profiling of single requests (cProfile or stack sampling) and stored profile results"""
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+PROFILERS = ('cprofile', 'sample')
+DEFAULT_SAMPLE_INTERVAL = 0.005
+PSTATS_SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls', 'time', 'name', 'filename')
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Wall-clock sampling profiler over the threads of this process.
+
+    A background thread reads every thread's stack each ``interval``
+    seconds and counts it as a collapsed stack (root first, frames joined
+    by ``;``, the thread name as the root), the input format of flame
+    graph tools. Waiting threads are sampled too, so time spent blocked
+    shows up as well as time on the CPU. ``thread_ids`` limits sampling to
+    those threads.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, seconds=None, on_finish=None):
+        """Sample until stop(), or for ``seconds`` and then call ``on_finish(sampler)``"""
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, args=(seconds, on_finish), name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self, seconds, on_finish):
+        own_id = threading.get_ident()
+        deadline = self.started + seconds if seconds is not None else None
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own_id)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        self.duration = time.perf_counter() - self.started
+        if on_finish is not None:
+            on_finish(self)
+
+    def sample(self, exclude=None):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == exclude or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            frames.append(names.get(thread_id, f'thread-{thread_id}'))
+            self.stacks[';'.join(reversed(frames))] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """``stack count`` lines, most sampled first"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Profiles the current thread between start and stop, with cProfile or by sampling its stack"""
+
+    def __init__(self, kind, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.kind = kind
+        self.interval = interval
+        self._profile = None
+        self._sampler = None
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.kind == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            # Only this request's thread, not the other requests served meanwhile
+            self._sampler = StackSampler(self.interval, thread_ids={threading.get_ident()}).start()
+        return self
+
+    def stop(self):
+        """(data, metadata) to hand to ProfileStore.save"""
+        duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.create_stats()
+            return marshal.dumps(self._profile.stats), {'duration_ms': duration_ms}
+        self._sampler.stop()
+        return self._sampler.collapsed().encode('utf-8'), sample_metadata(self._sampler)
+
+
+def sample_metadata(sampler):
+    return {
+        'duration_ms': round(sampler.duration * 1000, 3),
+        'samples': sampler.samples,
+        'interval_ms': sampler.interval * 1000,
+    }
+
+
+def start_sampling(store, seconds, interval=DEFAULT_SAMPLE_INTERVAL):
+    """Sample every thread for ``seconds`` in the background, then save the profile.
+
+    Returns the profile id, or None if another sampling run is in progress.
+    """
+    profile_id = store.new_id()
+
+    def finish(sampler):
+        try:
+            store.save('sample', sampler.collapsed().encode('utf-8'), sample_metadata(sampler), profile_id)
+        finally:
+            with store.lock:
+                store.running.pop(profile_id, None)
+
+    with store.lock:
+        # One at a time: concurrent samplers would slow each other and the service
+        if store.running:
+            return None
+        store.running[profile_id] = {'id': profile_id, 'kind': 'sample', 'seconds': seconds,
+                                     'interval_ms': interval * 1000, 'created_at': time.time()}
+    StackSampler(interval).start(seconds, on_finish=finish)
+    return profile_id
+
+
+def render_pstats(data, sort='cumulative', limit=50):
+    """The text report of marshalled cProfile stats"""
+    stream = io.StringIO()
+    stats = pstats.Stats(_MarshalledStats(data), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class _MarshalledStats:
+    """Adapter so pstats.Stats can load stats from bytes instead of a file"""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+class ProfileStore:
+    """Finished profiles on disk: ``<id>.prof`` (pstats) or ``<id>.txt`` (collapsed stacks) plus ``<id>.json``.
+
+    Only the newest ``max_profiles`` are kept. Profiles still being
+    recorded are tracked in memory until saved.
+    """
+
+    def __init__(self, directory, max_profiles=100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        # id -> metadata of profiles still being recorded
+        self.running = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, profile_id + suffix)
+
+    @staticmethod
+    def _suffix(kind):
+        return '.prof' if kind == 'cprofile' else '.txt'
+
+    def save(self, kind, data, metadata, profile_id=None):
+        """Store one finished profile; returns its metadata including ``id``"""
+        metadata = dict(metadata, id=profile_id or self.new_id(), kind=kind, created_at=time.time())
+        with open(self._path(metadata['id'], self._suffix(kind)), 'wb') as f:
+            f.write(data)
+        # Metadata last: a profile is listed only once its data is complete
+        with open(self._path(metadata['id'], '.json'), 'w') as f:
+            json.dump(metadata, f)
+        with self.lock:
+            self._evict()
+        return metadata
+
+    def _evict(self):
+        profiles = self.list()
+        for metadata in profiles[self.max_profiles:]:
+            for suffix in ('.json', self._suffix(metadata['kind'])):
+                try:
+                    os.remove(self._path(metadata['id'], suffix))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    # Evicted or half-written meanwhile
+                    continue
+        return sorted(profiles, key=lambda metadata: metadata['created_at'], reverse=True)
+
+    def load(self, profile_id):
+        """(metadata, data) of a stored profile, or (None, None)"""
+        if not profile_id.isalnum():
+            return None, None
+        try:
+            with open(self._path(profile_id, '.json')) as f:
+                metadata = json.load(f)
+            with open(self._path(profile_id, self._suffix(metadata['kind'])), 'rb') as f:
+                return metadata, f.read()
+        except (OSError, ValueError):
+            return None, None
@@ -0,0 +1,66 @@
+import threading
+import time
+from profiling import ProfileStore, RequestProfiler, StackSampler, render_pstats, start_sampling
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_collapses_stacks_of_other_threads():
+    worker = threading.Thread(target=busy_wait, args=(0.3,), name='busy')
+    sampler = StackSampler(interval=0.005).start()
+    worker.start()
+    worker.join()
+    sampler.stop()
+    assert sampler.samples > 10
+    busy = [line for line in sampler.collapsed().splitlines() if line.startswith('busy;')]
+    assert busy and all('busy_wait (profiling_test.py:' in line for line in busy)
+    # Root first, count last
+    assert int(busy[0].rsplit(' ', 1)[1]) > 0
+    assert not any(line.startswith('stack-sampler;') for line in sampler.collapsed().splitlines())
+
+
+def test_sampled_request_profile_only_records_its_own_thread():
+    other = threading.Thread(target=busy_wait, args=(0.2,), name='other-request')
+    other.start()
+    profiler = RequestProfiler('sample', interval=0.005).start()
+    busy_wait(0.1)
+    data, metadata = profiler.stop()
+    other.join()
+    lines = data.decode('utf-8').splitlines()
+    assert metadata['samples'] > 5 and lines
+    assert all(line.startswith('MainThread;') for line in lines)
+
+
+def test_cprofile_results_round_trip_through_the_store(tmp_path):
+    store = ProfileStore(str(tmp_path), max_profiles=2)
+    ids = []
+    for _ in range(3):
+        profiler = RequestProfiler('cprofile').start()
+        busy_wait(0.01)
+        data, metadata = profiler.stop()
+        ids.append(store.save('cprofile', data, dict(metadata, path='/x'))['id'])
+        time.sleep(0.01)
+
+    assert [metadata['id'] for metadata in store.list()] == ids[:0:-1]
+    assert store.load(ids[0]) == (None, None)
+    metadata, data = store.load(ids[2])
+    assert metadata['path'] == '/x' and metadata['duration_ms'] >= 10
+    assert 'busy_wait' in render_pstats(data, sort='tottime', limit=5)
+    assert store.load('../etc') == (None, None)
+
+
+def test_start_sampling_saves_when_done_and_runs_one_at_a_time(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    profile_id = start_sampling(store, 0.1, interval=0.01)
+    assert profile_id in store.running
+    assert start_sampling(store, 0.1) is None
+    deadline = time.time() + 5
+    while store.running and time.time() < deadline:
+        time.sleep(0.01)
+    metadata, data = store.load(profile_id)
+    assert metadata['kind'] == 'sample' and metadata['samples'] >= 5
+    assert b'MainThread;' in data
@@ -0,0 +1,153 @@
+"""Multi-file proto uploads: archive extraction, import graphs and compile order"""
+import io
+import posixpath
+import re
+import tarfile
+import zipfile
+
+# One statement, split on ';': import "a.proto" / import public "b.proto" / import weak "c.proto"
+_IMPORT = re.compile(rb'\s*import\s+(?:public\s+|weak\s+)?"([^"]+)"\s*')
+_COMMENT = re.compile(rb'//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+DEFAULT_MAX_FILES = 1000
+# Uncompressed size of all extracted .proto files, so a small archive cannot expand without bound
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class BundleError(ValueError):
+    """The upload cannot be turned into a consistent set of proto files"""
+
+
+def find_imports(source):
+    """Paths imported by a .proto source (bytes), ignoring commented-out imports.
+
+    Statements are split on ';', so an import sharing a line with another
+    statement (``syntax = "proto3"; import "b.proto";``) is found too.
+    """
+    imports = []
+    for statement in _COMMENT.sub(b'', source).split(b';'):
+        match = _IMPORT.fullmatch(statement)
+        if match:
+            imports.append(match.group(1).decode('utf-8'))
+    return imports
+
+
+def normalize_path(name, root=''):
+    """Relative import path of an uploaded member, or None if it lies outside ``root``"""
+    path = posixpath.normpath(name.replace('\\', '/'))
+    if root:
+        root = posixpath.normpath(root.replace('\\', '/')).strip('/')
+        if not path.startswith(root + '/'):
+            return None
+        path = path[len(root) + 1:]
+    if path.startswith(('/', '../')) or path in ('.', '..') or ':' in path:
+        raise BundleError(f'Unsafe path in upload: {name}')
+    return path
+
+
+def is_archive(filename):
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _archive_members(filename, data):
+    """(name, size, read function) for each regular file of a zip or tar archive"""
+    if filename.lower().endswith('.zip'):
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.read(info)
+    else:
+        archive = tarfile.open(fileobj=io.BytesIO(data), mode='r:*')
+        for member in archive.getmembers():
+            # Links and devices are skipped, not followed
+            if member.isfile():
+                yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+
+
+def collect_sources(uploads, root='', max_files=DEFAULT_MAX_FILES, max_bytes=DEFAULT_MAX_BYTES):
+    """Map import path -> source for uploaded ``(filename, bytes)`` pairs.
+
+    Plain ``.proto`` uploads keep their (sanitized) file name; zip and tar
+    archives contribute every ``.proto`` member under ``root``, keyed by
+    its path relative to ``root``, which is how other files import it.
+    """
+    sources = {}
+    total = 0
+
+    def add(name, size, read, prefix=''):
+        nonlocal total
+        path = normalize_path(name, prefix)
+        if path is None or not path.endswith('.proto'):
+            return
+        total += size
+        if len(sources) >= max_files or total > max_bytes:
+            raise BundleError(f'Upload exceeds {max_files} proto files or {max_bytes} bytes')
+        if path in sources:
+            raise BundleError(f'{path} is uploaded more than once')
+        sources[path] = read()
+
+    for filename, data in uploads:
+        if is_archive(filename):
+            try:
+                for name, size, read in _archive_members(filename, data):
+                    add(name, size, read, root)
+            except (zipfile.BadZipFile, tarfile.TarError) as e:
+                raise BundleError(f'Cannot read archive {filename}: {e}')
+        elif filename.endswith('.proto'):
+            add(posixpath.basename(filename.replace('\\', '/')), len(data), lambda data=data: data)
+        else:
+            raise BundleError(f'{filename} is neither a .proto file nor a zip/tar archive')
+    if not sources:
+        raise BundleError('No .proto files in upload')
+    return sources
+
+
+def dependency_graph(sources):
+    """path -> imported paths that are themselves in ``sources``"""
+    return {path: {name for name in find_imports(source) if name in sources} for path, source in sources.items()}
+
+
+def dependents(graph, changed):
+    """``changed`` plus every file importing one of them, directly or not"""
+    importers = {}
+    for path, imports in graph.items():
+        for name in imports:
+            importers.setdefault(name, set()).add(path)
+    affected = set(changed)
+    pending = list(changed)
+    while pending:
+        for importer in importers.get(pending.pop(), ()):
+            if importer not in affected:
+                affected.add(importer)
+                pending.append(importer)
+    return affected
+
+
+def topological_order(graph, paths=None):
+    """``paths`` (default: all) ordered so every file follows its imports.
+
+    Raises BundleError naming the files of an import cycle.
+    """
+    paths = sorted(graph if paths is None else paths)
+    wanted = set(paths)
+    order = []
+    # 1: on the current import path, 2: done
+    state = {}
+
+    def visit(path, trail):
+        if state.get(path) == 2:
+            return
+        if state.get(path) == 1:
+            cycle = trail[trail.index(path):] + [path]
+            raise BundleError(f'Import cycle: {" -> ".join(cycle)}')
+        state[path] = 1
+        for name in sorted(graph.get(path, ())):
+            visit(name, trail + [path])
+        state[path] = 2
+        if path in wanted:
+            order.append(path)
+
+    for path in paths:
+        visit(path, [])
+    return order
@@ -0,0 +1,85 @@
+import io
+import tarfile
+import zipfile
+import pytest
+from proto_bundle import (BundleError, collect_sources, dependency_graph, dependents, find_imports,
+                          topological_order)
+
+
+def zip_bytes(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def tar_bytes(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def test_find_imports_skips_comments():
+    source = b'syntax = "proto3";\n// import "old.proto";\n/* import "x.proto"; */\nimport public "a/b.proto";\n' \
+             b'import weak "c.proto";\nimport "google/protobuf/any.proto";\n'
+    assert find_imports(source) == ['a/b.proto', 'c.proto', 'google/protobuf/any.proto']
+
+
+def test_find_imports_after_other_statements_on_one_line():
+    source = b'syntax = "proto3"; import "b.proto"; package demo; import public "c.proto"; /* x */ import "d.proto";'
+    assert find_imports(source) == ['b.proto', 'c.proto', 'd.proto']
+
+
+def test_collect_sources_from_archives_and_files():
+    sources = collect_sources([
+        ('protos.zip', zip_bytes({'repo/protos/shop/v1/order.proto': b'o', 'repo/protos/README.md': b'',
+                                  'repo/other/skip.proto': b's'})),
+        ('common.tgz', tar_bytes({'repo/protos/common/id.proto': b'i'})),
+        ('extra.proto', b'e'),
+    ], root='repo/protos')
+    assert sources == {'shop/v1/order.proto': b'o', 'common/id.proto': b'i', 'extra.proto': b'e'}
+
+
+@pytest.mark.parametrize('name', ['../evil.proto', '/etc/evil.proto', 'a/../../evil.proto', 'c:/evil.proto'])
+def test_collect_sources_rejects_unsafe_paths(name):
+    with pytest.raises(BundleError):
+        collect_sources([('bad.zip', zip_bytes({name: b'x'}))])
+
+
+def test_collect_sources_limits_and_errors():
+    with pytest.raises(BundleError, match='more than once'):
+        collect_sources([('a.proto', b''), ('b.zip', zip_bytes({'a.proto': b''}))])
+    with pytest.raises(BundleError, match='exceeds'):
+        collect_sources([('big.zip', zip_bytes({f'{i}.proto': b'' for i in range(3)}))], max_files=2)
+    with pytest.raises(BundleError, match='Cannot read archive'):
+        collect_sources([('broken.zip', b'not a zip')])
+    with pytest.raises(BundleError, match='No .proto files'):
+        collect_sources([('empty.zip', zip_bytes({'notes.txt': b''}))])
+
+
+def test_dependents_and_compile_order():
+    sources = {
+        'common/id.proto': b'syntax = "proto3";',
+        'shop/order.proto': b'import "common/id.proto";',
+        'shop/cart.proto': b'import "shop/order.proto";\nimport "google/protobuf/any.proto";',
+        'billing.proto': b'import "common/id.proto";',
+        'unrelated.proto': b'',
+    }
+    graph = dependency_graph(sources)
+    assert graph['shop/cart.proto'] == {'shop/order.proto'}
+    assert dependents(graph, ['shop/order.proto']) == {'shop/order.proto', 'shop/cart.proto'}
+    order = topological_order(graph, dependents(graph, ['common/id.proto']))
+    assert order[0] == 'common/id.proto'
+    assert order.index('shop/order.proto') < order.index('shop/cart.proto')
+    assert set(order) == {'common/id.proto', 'shop/order.proto', 'shop/cart.proto', 'billing.proto'}
+
+
+def test_topological_order_reports_cycles():
+    graph = dependency_graph({'a.proto': b'import "b.proto";', 'b.proto': b'import "a.proto";'})
+    with pytest.raises(BundleError, match='a.proto -> b.proto -> a.proto'):
+        topological_order(graph)
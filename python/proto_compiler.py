@@ -0,0 +1,117 @@
+"""In-process .proto compilation into private descriptor pools"""
+import functools
+import importlib.metadata
+import os
+import subprocess
+import sys
+import tempfile
+import types
+from google.protobuf import descriptor_pb2
+from google.protobuf import descriptor_pool
+from google.protobuf import message_factory
+from google.protobuf.internal import enum_type_wrapper
+
+try:
+    # grpcio-tools bundles protoc as an extension module
+    import grpc_tools
+    from grpc_tools import _protoc_compiler
+    WELL_KNOWN_PROTOS = os.path.join(os.path.dirname(grpc_tools.__file__), '_proto')
+except ImportError:
+    _protoc_compiler = None
+    WELL_KNOWN_PROTOS = None
+
+
+def in_process_available():
+    return _protoc_compiler is not None
+
+
+def compiler_version():
+    """Version of the bundled compiler, part of compile cache keys"""
+    return f'grpcio-tools {importlib.metadata.version("grpcio-tools")}'
+
+
+@functools.lru_cache(maxsize=None)
+def protoc_version():
+    """``protoc --version`` of the protoc binary on PATH"""
+    result = subprocess.run(['protoc', '--version'], capture_output=True, text=True)
+    return result.stdout.strip() or 'protoc unknown'
+
+
+def compile_to_descriptor_set(proto_file_path, include_paths):
+    """Compile a .proto file (and its imports) into a FileDescriptorSet.
+
+    Returns (FileDescriptorSet, error).
+    """
+    return compile_files([proto_file_path], include_paths)
+
+
+def compile_files(proto_file_paths, include_paths, use_protoc_binary=False):
+    """Compile several .proto files in one compiler run into one FileDescriptorSet.
+
+    The set holds every input file and everything they import. With
+    ``use_protoc_binary`` the protoc on PATH is run instead of the bundled
+    compiler. Returns (FileDescriptorSet, error).
+    """
+    if not use_protoc_binary and _protoc_compiler is None:
+        return None, 'In-process compiler not available (pip install grpcio-tools)'
+
+    include_paths = list(include_paths)
+    if not use_protoc_binary:
+        include_paths.append(WELL_KNOWN_PROTOS)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'descriptor_set.pb')
+        args = ['protoc', f'--descriptor_set_out={output_path}', '--include_imports']
+        args += [f'--proto_path={path}' for path in include_paths]
+        args += list(proto_file_paths)
+
+        if use_protoc_binary:
+            result = subprocess.run(args, capture_output=True, text=True)
+            if result.returncode != 0:
+                return None, f'Protoc compilation failed: {result.stderr}'
+        elif _protoc_compiler.run_main([arg.encode() for arg in args]) != 0:
+            return None, f'Proto compilation failed: {_error_text(args) or "unknown error"}'
+
+        descriptor_set = descriptor_pb2.FileDescriptorSet()
+        with open(output_path, 'rb') as f:
+            descriptor_set.ParseFromString(f.read())
+    return descriptor_set, None
+
+
+def build_module(descriptor_set, proto_filename):
+    """Build a module-like object exposing the classes of one compiled file.
+
+    Every call uses a fresh descriptor pool, so files declaring the same
+    symbols (or a file recompiled with changes) do not clash in the
+    process-wide default pool.
+    """
+    return build_modules(descriptor_set, [proto_filename])[proto_filename]
+
+
+def build_modules(descriptor_set, proto_filenames):
+    """build_module for several files of one set, sharing a single fresh pool"""
+    pool = descriptor_pool.DescriptorPool()
+    for file_proto in descriptor_set.file:
+        pool.Add(file_proto)
+    return {name: _module(pool.FindFileByName(name)) for name in proto_filenames}
+
+
+def _module(file_descriptor):
+    module = types.ModuleType(file_descriptor.name.replace('.proto', '_pb2'))
+    module.DESCRIPTOR = file_descriptor
+    for name, descriptor in file_descriptor.message_types_by_name.items():
+        setattr(module, name, message_factory.GetMessageClass(descriptor))
+    for name, descriptor in file_descriptor.enum_types_by_name.items():
+        setattr(module, name, enum_type_wrapper.EnumTypeWrapper(descriptor))
+        for value in descriptor.values:
+            setattr(module, value.name, value.number)
+    return module
+
+
+def _error_text(args):
+    """Errors of a failed bundled-protoc run, from a rerun in a subprocess.
+
+    run_main only writes them to the process-wide stderr, which other
+    request threads share, so it is not captured in-process.
+    """
+    result = subprocess.run([sys.executable, '-m', 'grpc_tools.protoc'] + args[1:], capture_output=True, text=True)
+    return result.stderr.strip()
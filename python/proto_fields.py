@@ -0,0 +1,9 @@
+"""Field descriptor helpers shared by the services and the test-data generator"""
+from google.protobuf.descriptor import FieldDescriptor
+
+
+def is_repeated(field):
+    """FieldDescriptor.label was removed in protobuf 7 in favour of is_repeated"""
+    if hasattr(field, 'is_repeated'):
+        return field.is_repeated
+    return field.label == FieldDescriptor.LABEL_REPEATED
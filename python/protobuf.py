@@ -9,8 +9,15 @@ from google.protobuf.message import Message
 from google.protobuf.json_format import MessageToJson, Parse
 from google.protobuf.descriptor import FieldDescriptor
 import tempfile
+import hashlib
 import shutil
 from werkzeug.utils import secure_filename
+from message_registry import MessageRegistry
+from proto_fields import is_repeated
+from http_client import PooledHTTPClient
+import proto_compiler
+import threading
+import time
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -23,11 +30,49 @@ os.makedirs(app.config['PROTO_FOLDER'], exist_ok=True)
 
 class ProtobufService:
     def __init__(self):
+        # proto filename -> (source sha256, loaded module)
         self.compiled_modules = {}
+        self.module_cache_hits = 0
+        self.module_cache_misses = 0
+        self._module_lock = threading.Lock()
+        self.registry = MessageRegistry()
+        self._registry_loaded = False
+        self._registry_lock = threading.Lock()
+        # Build classes in-process when grpcio-tools is installed, else shell out to protoc
+        self.use_in_process_compiler = proto_compiler.in_process_available()
+    
+    def _source_hash(self, proto_filename):
+        """sha256 of the uploaded .proto source, or None if it is missing"""
+        source_path = os.path.join(app.config['UPLOAD_FOLDER'], proto_filename)
+        try:
+            with open(source_path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+    
+    def _compile_in_process(self, proto_file_path):
+        """Compile straight into a descriptor pool; returns (module, error)"""
+        proto_filename = os.path.basename(proto_file_path)
+        descriptor_set, error = proto_compiler.compile_to_descriptor_set(
+            proto_file_path, [os.path.dirname(proto_file_path) or '.']
+        )
+        if error:
+            return None, error
+        return proto_compiler.build_module(descriptor_set, proto_filename), None
     
     def compile_proto(self, proto_file_path):
         """Compile .proto file to Python modules"""
         try:
+            if self.use_in_process_compiler:
+                module, error = self._compile_in_process(proto_file_path)
+                if error:
+                    return False, error
+                proto_filename = os.path.basename(proto_file_path)
+                source_hash = self._source_hash(proto_filename)
+                with self._module_lock:
+                    self.compiled_modules[proto_filename] = (source_hash, module)
+                return True, "Proto file compiled successfully"
+            
             proto_dir = os.path.dirname(proto_file_path)
             output_dir = app.config['PROTO_FOLDER']
             
@@ -44,31 +89,93 @@ class ProtobufService:
             if result.returncode != 0:
                 return False, f"Protoc compilation failed: {result.stderr}"
             
+            # Drop the cached module if the source changed since it was loaded
+            proto_filename = os.path.basename(proto_file_path)
+            source_hash = self._source_hash(proto_filename)
+            with self._module_lock:
+                cached = self.compiled_modules.get(proto_filename)
+                if cached and cached[0] != source_hash:
+                    del self.compiled_modules[proto_filename]
+            
             return True, "Proto file compiled successfully"
             
         except Exception as e:
             return False, f"Compilation error: {str(e)}"
     
     def load_proto_module(self, proto_filename):
-        """Load compiled protobuf module"""
+        """Load compiled protobuf module, reusing the cached copy when possible"""
+        with self._module_lock:
+            cached = self.compiled_modules.get(proto_filename)
+            if cached:
+                self.module_cache_hits += 1
+                return cached[1], None
+            self.module_cache_misses += 1
+        
         try:
-            # Convert filename to module name
-            module_name = proto_filename.replace('.proto', '_pb2.py')
-            module_path = os.path.join(app.config['PROTO_FOLDER'], module_name)
+            source_hash = self._source_hash(proto_filename)
             
-            if not os.path.exists(module_path):
-                return None, f"Compiled module not found: {module_path}"
+            if self.use_in_process_compiler and source_hash:
+                # Compile the uploaded source directly instead of importing generated code
+                source_path = os.path.join(app.config['UPLOAD_FOLDER'], proto_filename)
+                module, error = self._compile_in_process(source_path)
+                if error:
+                    return None, error
+            else:
+                # Convert filename to module name
+                module_name = proto_filename.replace('.proto', '_pb2.py')
+                module_path = os.path.join(app.config['PROTO_FOLDER'], module_name)
+                
+                if not os.path.exists(module_path):
+                    return None, f"Compiled module not found: {module_path}"
+                
+                # Load module dynamically
+                spec = importlib.util.spec_from_file_location(module_name[:-3], module_path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
             
-            # Load module dynamically
-            spec = importlib.util.spec_from_file_location("proto_module", module_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
+            with self._module_lock:
+                # Another thread may have loaded it meanwhile; keep the first copy
+                cached = self.compiled_modules.setdefault(proto_filename, (source_hash, module))
             
-            return module, None
+            return cached[1], None
             
         except Exception as e:
             return None, f"Module loading error: {str(e)}"
     
+    def module_cache_stats(self):
+        """Hit/miss counters and contents of the compiled module cache"""
+        with self._module_lock:
+            return {
+                'hits': self.module_cache_hits,
+                'misses': self.module_cache_misses,
+                'cached_modules': sorted(self.compiled_modules),
+            }
+    
+    def register_proto(self, proto_filename):
+        """(Re)load one compiled proto file into the message registry"""
+        module, error = self.load_proto_module(proto_filename)
+        if module:
+            self.registry.register_module(proto_filename, module)
+        else:
+            self.registry.register_error(proto_filename, error)
+        return module, error
+    
+    def ensure_registry(self):
+        """Index every uploaded proto file once; later uploads update it incrementally"""
+        if self._registry_loaded:
+            return self.registry
+        with self._registry_lock:
+            if not self._registry_loaded:
+                for filename in sorted(os.listdir(app.config['UPLOAD_FOLDER'])):
+                    if filename.endswith('.proto'):
+                        self.register_proto(filename)
+                self._registry_loaded = True
+        return self.registry
+    
+    def find_message_class(self, message_type):
+        """Resolve a message name to its class via the registry"""
+        return self.ensure_registry().resolve(message_type)
+    
     def generate_test_data(self, message_class):
         """Generate test data for protobuf message"""
         try:
@@ -76,7 +183,7 @@ class ProtobufService:
             
             # Fill fields with sample data based on type
             for field in message.DESCRIPTOR.fields:
-                if field.label == FieldDescriptor.LABEL_REPEATED:
+                if is_repeated(field):
                     continue  # Skip repeated fields for simplicity
                 
                 if field.type == FieldDescriptor.TYPE_STRING:
@@ -98,6 +205,7 @@ class ProtobufService:
             return None, f"Test data generation error: {str(e)}"
 
 protobuf_service = ProtobufService()
+http_client = PooledHTTPClient()
 
 @app.route('/')
 def index():
@@ -206,14 +314,11 @@ def upload_proto():
         success, message = protobuf_service.compile_proto(filepath)
         
         if success:
-            # Try to load and analyze the compiled module
-            module, error = protobuf_service.load_proto_module(filename)
+            # Load the compiled module and index its message types
+            protobuf_service.ensure_registry()
+            module, error = protobuf_service.register_proto(filename)
             if module:
-                # Get available message types
-                message_types = [
-                    name for name in dir(module) 
-                    if hasattr(getattr(module, name), 'DESCRIPTOR')
-                ]
+                message_types = protobuf_service.registry.list_types().get(filename, [])
                 
                 return jsonify({
                     'success': True,
@@ -248,22 +353,14 @@ def test_api():
         if not api_url or not message_type:
             return jsonify({'error': 'API URL and message type are required'}), 400
         
-        # Find the proto module that contains this message type
-        proto_module = None
-        message_class = None
-        
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            if filename.endswith('.proto'):
-                module, error = protobuf_service.load_proto_module(filename)
-                if module and hasattr(module, message_type):
-                    proto_module = module
-                    message_class = getattr(module, message_type)
-                    break
+        # Resolve the message class through the registry
+        message_class, error = protobuf_service.find_message_class(message_type)
         
         if not message_class:
-            return jsonify({'error': f'Message type {message_type} not found'}), 400
+            return jsonify({'error': error}), 400
         
         # Generate or parse test data
+        build_started = time.perf_counter()
         if custom_data.strip():
             try:
                 test_data_dict = json.loads(custom_data)
@@ -275,6 +372,7 @@ def test_api():
             test_message, error = protobuf_service.generate_test_data(message_class)
             if error:
                 return jsonify({'error': error}), 400
+        build_finished = time.perf_counter()
         
         # Prepare request based on protocol
         headers = {}
@@ -286,20 +384,18 @@ def test_api():
         else:  # REST/JSON
             headers['Content-Type'] = 'application/json'
             payload = MessageToJson(test_message)
+        serialize_finished = time.perf_counter()
         
         # Make API request
-        start_time = requests.get('http://worldtimeapi.org/api/timezone/Etc/UTC').json()['unixtime'] if True else 0
-        
         if method == 'GET':
-            response = requests.get(api_url, headers=headers, timeout=30)
-        elif method == 'POST':
-            response = requests.post(api_url, headers=headers, data=payload, timeout=30)
-        elif method == 'PUT':
-            response = requests.put(api_url, headers=headers, data=payload, timeout=30)
+            response, network_timing = http_client.timed_request('GET', api_url, headers=headers, timeout=30)
+        elif method in ('POST', 'PUT'):
+            response, network_timing = http_client.timed_request(method, api_url, headers=headers, data=payload, timeout=30)
         else:
             return jsonify({'error': 'Unsupported HTTP method'}), 400
         
         # Parse response
+        decode_started = time.perf_counter()
         response_data = None
         if response.headers.get('content-type', '').startswith('application/json'):
             try:
@@ -309,6 +405,13 @@ def test_api():
         else:
             response_data = response.text
         
+        timing = {
+            'message_build_ms': round((build_finished - build_started) * 1000, 3),
+            'serialization_ms': round((serialize_finished - build_finished) * 1000, 3),
+            **network_timing,
+            'response_decoding_ms': round((time.perf_counter() - decode_started) * 1000, 3)
+        }
+        
         result = {
             'success': True,
             'request': {
@@ -316,7 +419,7 @@ def test_api():
                 'method': method,
                 'protocol': protocol,
                 'headers': dict(headers),
-                'payload': payload.decode('utf-8') if protocol == 'rest' else f'<binary data: {len(payload)} bytes>',
+                'payload': payload if protocol == 'rest' else f'<binary data: {len(payload)} bytes>',
                 'test_data_used': MessageToJson(test_message)
             },
             'response': {
@@ -324,7 +427,8 @@ def test_api():
                 'headers': dict(response.headers),
                 'data': response_data,
                 'success': 200 <= response.status_code < 300
-            }
+            },
+            'timing': timing
         }
         
         return jsonify(result)
@@ -339,16 +443,10 @@ def generate_test_data_endpoint(message_type):
     """Generate test data for a specific message type"""
     try:
         # Find the message class
-        message_class = None
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            if filename.endswith('.proto'):
-                module, error = protobuf_service.load_proto_module(filename)
-                if module and hasattr(module, message_type):
-                    message_class = getattr(module, message_type)
-                    break
+        message_class, error = protobuf_service.find_message_class(message_type)
         
         if not message_class:
-            return jsonify({'error': f'Message type {message_type} not found'}), 404
+            return jsonify({'error': error}), 404
         
         test_message, error = protobuf_service.generate_test_data(message_class)
         if error:
@@ -366,19 +464,12 @@ def generate_test_data_endpoint(message_type):
 def list_message_types():
     """List all available message types from uploaded proto files"""
     try:
-        all_types = {}
+        registry = protobuf_service.ensure_registry()
         
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            if filename.endswith('.proto'):
-                module, error = protobuf_service.load_proto_module(filename)
-                if module:
-                    message_types = [
-                        name for name in dir(module) 
-                        if hasattr(getattr(module, name), 'DESCRIPTOR')
-                    ]
-                    all_types[filename] = message_types
-        
-        return jsonify({'message_types': all_types})
+        return jsonify({
+            'message_types': registry.list_types(),
+            'load_errors': registry.load_errors()
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2,12 +2,16 @@ import io
 import os
 import json
 import tempfile
+import shutil
+import threading
+import time
 import types
 import pytest
 from unittest import mock
 from protobuf_with_test_data import app, ProtobufService, SAMPLE_PROTO_CONTENT
-from protobuf_with_test_data import sample_users, sample_products
+from protobuf_with_test_data import sample_users, sample_products, http_client
 import importlib
+import protobuf_with_test_data
 
 # test_protobuf.py
 
@@ -116,7 +120,7 @@ def test_test_api_get_users(client):
         "method": "GET",
         "custom_data": ""
     }
-    with mock.patch('protobuf.requests.get') as mock_get:
+    with mock.patch.object(http_client, 'request') as mock_get:
         mock_resp = mock.Mock()
         mock_resp.status_code = 200
         mock_resp.headers = {'content-type': 'application/json'}
@@ -143,7 +147,7 @@ def test_test_api_post_json(client):
             "tags": ["test"]
         })
     }
-    with mock.patch('protobuf.requests.post') as mock_post:
+    with mock.patch.object(http_client, 'request') as mock_post:
         mock_resp = mock.Mock()
         mock_resp.status_code = 201
         mock_resp.headers = {'content-type': 'application/json'}
@@ -164,7 +168,7 @@ def test_test_api_post_protobuf(client):
         "method": "POST",
         "custom_data": ""
     }
-    with mock.patch('protobuf.requests.post') as mock_post:
+    with mock.patch.object(http_client, 'request') as mock_post:
         mock_resp = mock.Mock()
         mock_resp.status_code = 201
         mock_resp.headers = {'content-type': 'application/x-protobuf'}
@@ -209,4 +213,905 @@ def test_test_api_invalid_custom_data(client):
     rv = client.post('/test_api', json=payload)
     assert rv.status_code == 400
     data = rv.get_json()
-    assert 'error' in data
\ No newline at end of file
+    assert 'error' in data
+def test_load_proto_module_is_cached():
+    service = ProtobufService()
+    service.use_in_process_compiler = False
+    fake_spec = mock.Mock()
+    with mock.patch('importlib.util.spec_from_file_location', return_value=fake_spec) as mock_spec, \
+         mock.patch('importlib.util.module_from_spec', return_value=types.ModuleType('sample_pb2')):
+        first, error = service.load_proto_module('sample.proto')
+        assert error is None
+        second, _ = service.load_proto_module('sample.proto')
+        assert first is second
+        assert mock_spec.call_count == 1
+        assert fake_spec.loader.exec_module.call_count == 1
+    stats = service.module_cache_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['cached_modules'] == ['sample.proto']
+
+def test_compile_proto_invalidates_changed_source():
+    service = ProtobufService()
+    service.use_in_process_compiler = False
+    service.compiled_modules['sample.proto'] = (service._source_hash('sample.proto'), types.ModuleType('sample_pb2'))
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.return_value = types.SimpleNamespace(returncode=0, stderr='', stdout='')
+        # Unchanged source keeps the cached module
+        service.compile_proto(os.path.join('uploads', 'sample.proto'))
+        assert 'sample.proto' in service.compiled_modules
+        with mock.patch.object(service, '_source_hash', return_value='changed'):
+            service.compile_proto(os.path.join('uploads', 'sample.proto'))
+    assert 'sample.proto' not in service.compiled_modules
+
+def test_cache_stats_endpoint(client):
+    rv = client.get('/cache_stats')
+    assert rv.status_code == 200
+    assert 'hits' in rv.get_json()['module_cache']
+
+def test_find_message_class_scans_uploads_once():
+    service = ProtobufService()
+    with mock.patch('os.listdir', wraps=os.listdir) as mock_listdir:
+        message_class, error = service.find_message_class('UserRequest')
+        assert error is None
+        assert message_class.DESCRIPTOR.name == 'UserRequest'
+        service.find_message_class('ProductRequest')
+        assert mock_listdir.call_count == 1
+    missing, error = service.find_message_class('NonExistentType')
+    assert missing is None
+    assert 'not found' in error
+
+def test_compile_proto_in_process_does_not_spawn_protoc(tmp_path):
+    service = ProtobufService()
+    if not service.use_in_process_compiler:
+        pytest.skip("grpcio-tools not installed")
+    proto_path = tmp_path / 'inproc.proto'
+    proto_path.write_text('syntax = "proto3";\npackage demo;\nmessage Ping { string id = 1; }\n')
+    with mock.patch('subprocess.run') as mock_run:
+        success, message = service.compile_proto(str(proto_path))
+        assert mock_run.call_count == 0
+    assert success, message
+    module, error = service.load_proto_module('inproc.proto')
+    assert error is None
+    assert module.Ping(id='x').SerializeToString() == b'\n\x01x'
+    assert service.compile_info['inproc.proto']['compiler'] == 'in_process'
+    assert service.compile_latency_stats()['in_process']['count'] == 1
+
+def test_compile_proto_in_process_reports_errors(tmp_path):
+    service = ProtobufService()
+    if not service.use_in_process_compiler:
+        pytest.skip("grpcio-tools not installed")
+    proto_path = tmp_path / 'broken.proto'
+    proto_path.write_text('syntax = "proto3";\nmessage Broken { strin id = 1; }\n')
+    run_main = protobuf_with_test_data.proto_compiler._protoc_compiler.run_main
+    with mock.patch.object(protobuf_with_test_data.proto_compiler._protoc_compiler, 'run_main',
+                           side_effect=run_main) as mock_run_main, \
+         mock.patch('os.dup2') as mock_dup2:
+        success, message = service.compile_proto(str(proto_path))
+    assert success is False
+    assert 'strin' in message
+    # One in-process run; the error text comes from a subprocess rerun, never from redirecting fd 2
+    assert mock_run_main.call_count == 1
+    assert mock_dup2.call_count == 0
+
+def test_test_api_load_mode(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "custom_data": "",
+        "mode": "load",
+        "total_requests": 50,
+        "concurrency": 5
+    }
+    with mock.patch('requests.Session.request') as mock_request:
+        mock_request.return_value = mock.Mock(status_code=201)
+        rv = client.post('/test_api', json=payload)
+    assert rv.status_code == 200
+    data = rv.get_json()
+    assert data['load']['completed'] == 50
+    assert data['load']['status_counts'] == {'201': 50}
+    assert set(data['load']['latency_ms']) >= {'p50', 'p90', 'p99', 'max'}
+    assert mock_request.call_count == 50
+
+def test_test_api_load_mode_rejects_bad_settings(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "method": "POST",
+        "mode": "load",
+        "concurrency": 0
+    }
+    rv = client.post('/test_api', json=payload)
+    assert rv.status_code == 400
+    assert 'concurrency' in rv.get_json()['error']
+    
+    rv = client.post('/test_api', json={**payload, "concurrency": 2, "arrival": {"type": "ramp", "to_rate": 5}})
+    assert rv.status_code == 400
+    assert 'ramp' in rv.get_json()['error']
+    rv = client.post('/test_api', json={**payload, "concurrency": 2, "target_rps": 5,
+                                        "arrival": {"type": "constant", "rate": 5}})
+    assert rv.status_code == 400
+
+def test_test_api_load_mode_open_loop_schedule(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "mode": "load",
+        "total_requests": 40,
+        "concurrency": 4,
+        "arrival": {"type": "step", "steps": [{"rate": 400, "duration_s": 0.05}, {"rate": 800, "duration_s": 1}]}
+    }
+    with mock.patch('requests.Session.request') as mock_request:
+        mock_request.return_value = mock.Mock(status_code=201)
+        rv = client.post('/test_api', json=payload)
+    assert rv.status_code == 200
+    load = rv.get_json()['load']
+    assert load['completed'] == 40
+    assert load['settings']['arrival']['tolerance_ms'] == 5
+    # 20 requests in the first 50ms, then 20 more at 800/s
+    assert load['schedule']['planned_duration_s'] == pytest.approx(0.074)
+    assert set(load['schedule']) >= {'missed', 'missed_ratio', 'start_lag_ms'}
+    assert 'service_time_ms' in load
+
+def test_test_api_reports_timing_breakdown(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "custom_data": ""
+    }
+    with mock.patch.object(http_client, 'request') as mock_post:
+        mock_post.return_value = mock.Mock(status_code=201, headers={'content-type': 'application/json'})
+        mock_post.return_value.json.return_value = {}
+        rv = client.post('/test_api', json=payload)
+    timing = rv.get_json()['timing']
+    for phase in ('message_build_ms', 'serialization_ms', 'dns_ms', 'tcp_connect_ms',
+                  'time_to_first_byte_ms', 'body_download_ms', 'response_decoding_ms'):
+        assert timing[phase] >= 0
+
+def test_test_api_batch_streams_ndjson(client):
+    tests = [
+        {"id": "users", "api_url": "http://localhost:8080/api/users", "message_type": "UserRequest",
+         "protocol": "protobuf", "method": "POST"},
+        {"id": "products", "api_url": "http://localhost:8080/api/products", "message_type": "ProductRequest",
+         "protocol": "rest", "method": "POST"},
+        {"id": "missing", "api_url": "http://localhost:8080/api/users", "message_type": "NonExistentType"},
+    ]
+    with mock.patch.object(http_client, 'request') as mock_request, \
+         mock.patch('protobuf_with_test_data.protobuf_service.find_message_class',
+                    wraps=protobuf_with_test_data.protobuf_service.find_message_class) as mock_find:
+        mock_request.return_value = mock.Mock(status_code=201, headers={'content-type': 'text/plain'}, text='ok')
+        rv = client.post('/test_api/batch', json={"tests": tests + tests[:1], "max_workers": 2})
+        assert rv.status_code == 200
+        assert rv.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+        # Message types are resolved once per batch, not once per test
+        assert mock_find.call_count == 3
+    assert sorted(line['index'] for line in lines) == [0, 1, 2, 3]
+    by_index = {line['index']: line for line in lines}
+    assert by_index[0]['id'] == 'users' and by_index[0]['response']['status_code'] == 201
+    assert by_index[1]['status'] == 200
+    assert by_index[2]['status'] == 400 and 'not found' in by_index[2]['error']
+
+def test_test_api_batch_rejects_empty_list(client):
+    rv = client.post('/test_api/batch', json={"tests": []})
+    assert rv.status_code == 400
+
+def _protobuf_response(message):
+    response = mock.Mock(status_code=201, headers={'content-type': 'application/x-protobuf'})
+    response.content = message.SerializeToString()
+    return response
+
+def test_test_api_decodes_protobuf_response(client):
+    response_class, _ = protobuf_with_test_data.protobuf_service.find_message_class('UserResponse')
+    reply = response_class(id='user_7', status='created', timestamp=5)
+    reply.user.name = 'Bob'
+    reply.user.tags.extend(['a', 'b'])
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "response_message_type": "UserResponse"
+    }
+    with mock.patch.object(http_client, 'request', return_value=_protobuf_response(reply)):
+        full = client.post('/test_api', json=payload).get_json()
+        partial = client.post('/test_api', json=dict(payload, response_fields=['id', 'user.tags', 'bogus'])).get_json()
+    assert full['response']['data']['user'] == {'name': 'Bob', 'tags': ['a', 'b']}
+    assert full['timing']['response_parse_ms'] >= 0
+    assert partial['response']['data']['id'] == 'user_7'
+    assert partial['response']['data']['user'] == {'tags': ['a', 'b']}
+    assert 'status' not in partial['response']['data']
+    assert partial['response']['data']['_field_errors'] == ['bogus: unknown field bogus']
+
+def test_select_fields_keeps_unset_presence_fields_unset(tmp_path):
+    if not protobuf_with_test_data.proto_compiler.in_process_available():
+        pytest.skip("grpcio-tools not installed")
+    proto_path = tmp_path / 'presence.proto'
+    proto_path.write_text('syntax = "proto3";\nmessage Reply {\n'
+                          '  optional int32 code = 1;\n  oneof result { string ok = 2; string error = 3; }\n}\n')
+    descriptor_set, error = protobuf_with_test_data.proto_compiler.compile_to_descriptor_set(
+        str(proto_path), [str(tmp_path)])
+    assert error is None
+    reply_class = protobuf_with_test_data.proto_compiler.build_module(descriptor_set, 'presence.proto').Reply
+    partial, errors = protobuf_with_test_data.select_fields(reply_class(error='boom'), ['code', 'ok', 'error'])
+    assert errors == []
+    assert partial.WhichOneof('result') == 'error'
+    assert not partial.HasField('code')
+    assert not partial.HasField('ok')
+
+def test_test_api_skips_full_decode_of_large_protobuf_response(client):
+    response_class, _ = protobuf_with_test_data.protobuf_service.find_message_class('UserResponse')
+    reply = response_class(id='user_1', message='x' * 2048)
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "response_message_type": "UserResponse"
+    }
+    with mock.patch.object(http_client, 'request', return_value=_protobuf_response(reply)), \
+         mock.patch.dict(app.config, {'MAX_FULL_DECODE_BYTES': 1024}):
+        data = client.post('/test_api', json=payload).get_json()['response']['data']
+    assert data['_truncated'] is True
+    assert data['fields_present'] == ['id', 'message']
+
+def test_concurrent_user_posts_never_share_an_id():
+    responses = []
+    lock = threading.Lock()
+
+    def post_users():
+        with app.test_client() as thread_client:
+            for i in range(25):
+                rv = thread_client.post('/api/users', json={'name': f'user{i}'})
+                with lock:
+                    responses.append(rv.get_json()['id'])
+
+    threads = [threading.Thread(target=post_users) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(responses)) == 200
+    assert len(sample_users) == 200
+
+def test_get_users_pages_with_cursor(client):
+    for i in range(5):
+        client.post('/api/users', json={'name': f'user{i}'})
+
+    seen = []
+    rv = client.get('/api/users?limit=2')
+    while True:
+        data = rv.get_json()
+        seen.extend(data['users'])
+        if data['next_cursor'] is None:
+            break
+        rv = client.get(f"/api/users?limit=2&cursor={data['next_cursor']}")
+    assert len(seen) == 5
+    assert seen == sorted(seen, key=lambda user_id: int(user_id.split('_')[1]))
+
+    for i in range(5, 12):
+        client.post('/api/users', json={'name': f'user{i}'})
+    page = list(client.get('/api/users?limit=12').get_json()['users'])
+    assert page == sorted(page, key=lambda user_id: int(user_id.split('_')[1]))
+
+    assert client.get('/api/users?limit=0').status_code == 400
+    assert client.get('/api/users?cursor=prod_1').status_code == 400
+
+def test_post_users_rejects_non_object_json(client):
+    rv = client.post('/api/users', json=['not', 'an', 'object'])
+    assert rv.status_code == 400
+    assert len(sample_users) == 0
+    assert client.post('/api/products', json=[1]).status_code == 400
+
+def test_get_users_streams_ndjson_and_protobuf(client):
+    for i in range(3):
+        client.post('/api/users', json={'name': f'user{i}', 'age': i})
+
+    rv = client.get('/api/users?format=ndjson')
+    assert rv.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+    assert [line['name'] for line in lines] == ['user0', 'user1', 'user2']
+
+    module, _ = protobuf_with_test_data.protobuf_service.load_proto_module('sample.proto')
+    rv = client.get('/api/users?limit=2', headers={'Accept': 'application/x-protobuf'})
+    user_list = module.UserList()
+    user_list.ParseFromString(rv.data)
+    assert [user.user.name for user in user_list.users] == ['user0', 'user1']
+    assert user_list.next_cursor == user_list.users[1].id
+
+def test_ndjson_listing_streams_store_ids_over_body_ids(client):
+    created = client.post('/api/users', json={'id': 'bogus', 'name': 'a'}).get_json()
+    client.post('/api/users', json={'name': 'b'})
+    
+    rv = client.get('/api/users?format=ndjson')
+    lines = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+    assert lines[0]['id'] == created['id'] != 'bogus'
+    # Resuming from a streamed id works
+    rv = client.get(f"/api/users?format=ndjson&cursor={lines[0]['id']}")
+    assert rv.status_code == 200
+    assert [json.loads(line)['name'] for line in rv.get_data(as_text=True).splitlines()] == ['b']
+
+def test_bulk_create_users_from_delimited_protobuf(client):
+    from bulk_stream import encode_delimited
+    module, _ = protobuf_with_test_data.protobuf_service.load_proto_module('sample.proto')
+    payloads = [module.UserRequest(name=f'user{i}', tags=['bulk']).SerializeToString() for i in range(3)]
+    payloads.insert(1, b'\xff\xff')
+
+    rv = client.post('/api/users:bulk', data=encode_delimited(payloads),
+                     headers={'Content-Type': 'application/x-protobuf'})
+    assert rv.status_code == 200
+    result = rv.get_json()
+    assert result['created'] == 3
+    assert result['failed'] == 1
+    assert result['errors'][0]['index'] == 1
+    assert [user['name'] for user in sample_users.to_dict().values()] == ['user0', 'user1', 'user2']
+
+    rv = client.post('/api/users:bulk', data=encode_delimited(payloads)[:-3],
+                     headers={'Content-Type': 'application/x-protobuf'})
+    assert rv.status_code == 400
+    assert rv.get_json()['created'] == 2
+
+def test_bulk_create_products_from_json_lines(client):
+    body = b'{"product_name": "A", "price": 1.5}\nnot json\n[]\n{"product_name": "B"}\n'
+    rv = client.post('/api/products:bulk', data=body, headers={'Content-Type': 'application/x-ndjson'})
+    result = rv.get_json()
+    assert (result['created'], result['failed']) == (2, 2)
+    assert [error['index'] for error in result['errors']] == [1, 2]
+    assert sample_products.get(result['last_id'])['product_name'] == 'B'
+
+    assert client.post('/api/products:bulk', data=b'{}', content_type='text/plain').status_code == 415
+
+def test_generate_test_data_seeded_stream(client):
+    rv = client.get('/generate_test_data/UserRequest')
+    assert rv.get_json()['test_data']['name'] == 'test_name'
+
+    first = client.get('/generate_test_data/UserRequest?count=20&seed=3').get_json()
+    again = client.get('/generate_test_data/UserRequest?count=20&seed=3').get_json()
+    assert first['seed'] == 3 and first['count'] == 20
+    assert first['test_data'] == again['test_data']
+    assert len({json.dumps(item, sort_keys=True) for item in first['test_data']}) > 1
+
+    rv = client.post('/generate_test_data/UserRequest?count=5&seed=1&format=ndjson',
+                     json={'distributions': {'fields': {'age': {'int_range': [18, 18]}}}})
+    assert rv.headers['X-Seed'] == '1'
+    lines = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+    assert len(lines) == 5 and all(line['age'] == 18 for line in lines)
+
+    assert client.get('/generate_test_data/UserRequest?count=0').status_code == 400
+    assert client.post('/generate_test_data/UserRequest', json={'distributions': {'bogus': 1}}).status_code == 400
+    rv = client.post('/generate_test_data/UserRequest?count=5&format=ndjson',
+                     json={'distributions': {'fields': {'age': {'values': ['old']}}}})
+    assert rv.status_code == 400
+    assert 'does not fit' in rv.get_json()['error']
+
+def test_test_api_load_mode_sends_random_payloads(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "mode": "load",
+        "total_requests": 20,
+        "concurrency": 4,
+        "random_data": {"seed": 11}
+    }
+    with mock.patch('requests.Session.request') as mock_request:
+        mock_request.return_value = mock.Mock(status_code=201)
+        rv = client.post('/test_api', json=payload)
+    data = rv.get_json()
+    assert data['request']['corpus']['seed'] == 11
+    assert data['request']['corpus']['payloads'] == 20
+    assert data['load']['completed'] == 20
+    bodies = [call.kwargs['data'] for call in mock_request.call_args_list]
+    assert len(set(bodies)) > 1
+
+def test_test_api_load_mode_reuses_saved_corpus(client, tmp_path):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "mode": "load",
+        "total_requests": 12,
+        "concurrency": 2,
+        "custom_data": json.dumps([{"name": "a"}, {"name": "b"}, {"name": "c"}]),
+        "corpus": {"file": "users.corpus"}
+    }
+    with mock.patch.dict(app.config, {'CORPUS_FOLDER': str(tmp_path)}), \
+         mock.patch('requests.Session.request') as mock_request:
+        mock_request.return_value = mock.Mock(status_code=201)
+        first = client.post('/test_api', json=payload).get_json()
+        with mock.patch.object(protobuf_with_test_data.protobuf_service, 'find_message_class') as find:
+            second = client.post('/test_api', json=payload).get_json()
+        find.assert_not_called()
+
+        other_data = client.post('/test_api', json=dict(payload, custom_data=json.dumps([{"name": "d"}])))
+        payload['protocol'] = 'rest'
+        mismatch = client.post('/test_api', json=payload)
+
+    assert first['request']['corpus']['reused'] is False
+    assert second['request']['corpus'] == {**first['request']['corpus'], 'reused': True,
+                                            'prepare_ms': second['request']['corpus']['prepare_ms']}
+    assert first['request']['corpus']['payloads'] == 3
+    bodies = [call.kwargs['data'] for call in mock_request.call_args_list]
+    assert sorted(set(bodies)) == sorted(
+        protobuf_with_test_data.protobuf_service.find_message_class('UserRequest')[0](name=name).SerializeToString()
+        for name in 'abc')
+    assert bodies.count(bodies[0]) == 8
+    assert mismatch.status_code == 400
+    assert 'rebuild' in mismatch.get_json()['error']
+    assert other_data.status_code == 400
+    assert 'different custom_data' in other_data.get_json()['error']
+
+@pytest.mark.skipif(not protobuf_with_test_data.async_engine.available(), reason='aiohttp not installed')
+def test_test_api_async_jobs_are_polled_via_jobs_endpoint(client):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            body = b'{"ok": true}'
+            self.send_response(201)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    spec = {
+        "api_url": f"http://127.0.0.1:{server.server_address[1]}/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "method": "POST",
+        "async": True
+    }
+
+    def wait(job_id):
+        for _ in range(500):
+            job = client.get(f'/jobs/{job_id}').get_json()
+            if job['status'] not in ('queued', 'running'):
+                return job
+            time.sleep(0.01)
+
+    try:
+        rv = client.post('/test_api', json=spec)
+        assert rv.status_code == 202
+        job = wait(rv.get_json()['job_id'])
+        assert job['status'] == 'succeeded'
+        assert job['result']['response']['data'] == {'ok': True}
+
+        rv = client.post('/test_api', json={**spec, "mode": "load", "total_requests": 30, "concurrency": 5})
+        job = wait(rv.get_json()['job_id'])
+        assert job['result']['load']['status_counts'] == {'201': 30}
+        assert job['progress'] == {'completed': 30, 'total': 30}
+
+        rv = client.post('/test_api/batch', json={"async": True, "tests": [spec, {**spec, "message_type": "Nope"}]})
+        job = wait(rv.get_json()['job_id'])
+        assert [result['status'] for result in job['result']['results']] == [200, 400]
+
+        assert client.get('/jobs/unknown').status_code == 404
+        assert len(client.get('/jobs').get_json()['jobs']) >= 3
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_test_api_load_mode_validates_processes(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "mode": "load",
+        "processes": 0
+    }
+    rv = client.post('/test_api', json=payload)
+    assert rv.status_code == 400
+    assert 'processes' in rv.get_json()['error']
+
+    with mock.patch.object(protobuf_with_test_data.process_load, 'run_process_load_test',
+                           return_value={'completed': 100}) as run:
+        rv = client.post('/test_api', json={**payload, "processes": 2, "pin_cpus": True})
+    assert rv.get_json()['load'] == {'completed': 100}
+    assert run.call_args.kwargs['processes'] == 2 and run.call_args.kwargs['pin_cpus'] is True
+
+@pytest.fixture
+def greeter_server():
+    grpc_client_test = pytest.importorskip('grpc_client_test')
+    if not protobuf_with_test_data.grpc_client.available():
+        pytest.skip('grpcio not installed')
+    from grpc_stub import StubServer
+    import proto_compiler
+    with tempfile.TemporaryDirectory() as proto_dir:
+        with open(os.path.join(proto_dir, 'greeter.proto'), 'w') as f:
+            f.write(grpc_client_test.GREETER_PROTO)
+        descriptor_set, error = proto_compiler.compile_to_descriptor_set(
+            os.path.join(proto_dir, 'greeter.proto'), [proto_dir])
+    assert error is None
+    module = proto_compiler.build_module(descriptor_set, 'greeter.proto')
+    registry = protobuf_with_test_data.protobuf_service.ensure_registry()
+    registry.register_module('greeter.proto', module)
+    try:
+        with StubServer([module.DESCRIPTOR.services_by_name['Greeter']]) as server:
+            yield server
+    finally:
+        registry.unregister('greeter.proto')
+
+def test_test_api_grpc_single_calls(client, greeter_server):
+    payload = {
+        "api_url": greeter_server.target,
+        "protocol": "grpc",
+        "rpc": "Greeter/SayHello",
+        "custom_data": json.dumps({"name": "ada"}),
+        "metadata": {"X-Tenant": "acme"}
+    }
+    rv = client.post('/test_api', json=payload)
+    assert rv.status_code == 200
+    data = rv.get_json()
+    assert data['request']['rpc'] == 'demo.v1.Greeter/SayHello'
+    assert data['request']['test_data_used'] == {'name': 'ada'}
+    assert data['request']['metadata'] == {'x-tenant': 'acme'}
+    assert data['response']['code'] == 'OK' and data['response']['success'] is True
+    assert data['response']['data'] == {'message': 'test_message'}
+    assert greeter_server.target in data['channels']['targets']
+    
+    # Client-streaming calls take a list; server-streaming calls return one entry per response
+    rv = client.post('/test_api', json={**payload, "rpc": "Greeter/Chat",
+                                        "custom_data": json.dumps([{"name": "a"}, {"name": "b"}])})
+    data = rv.get_json()
+    assert data['response']['trailing_metadata']['x-stub-requests'] == '2'
+    assert len(data['response']['data']) == 3
+    
+    rv = client.post('/test_api', json={**payload, "custom_data": json.dumps([{"name": "a"}, {"name": "b"}])})
+    assert rv.status_code == 400
+    assert 'client-streaming' in rv.get_json()['error']
+
+def test_test_api_grpc_reports_deadline_exceeded(client, greeter_server):
+    greeter_server.delay = 0.3
+    rv = client.post('/test_api', json={
+        "api_url": greeter_server.target, "protocol": "grpc", "rpc": "Greeter/SayHello", "timeout": 0.05
+    })
+    assert rv.status_code == 200
+    response = rv.get_json()['response']
+    assert response['code'] == 'DEADLINE_EXCEEDED'
+    assert response['success'] is False
+
+def test_test_api_grpc_validates_spec(client):
+    rv = client.post('/test_api', json={"api_url": "localhost:1", "protocol": "grpc"})
+    assert rv.status_code == 400
+    rv = client.post('/test_api', json={"api_url": "localhost:1", "protocol": "grpc", "rpc": "Nope/Missing"})
+    assert rv.status_code == 400
+    assert 'not found' in rv.get_json()['error']
+
+def test_test_api_grpc_load_mode(client, greeter_server):
+    rv = client.post('/test_api', json={
+        "api_url": greeter_server.target,
+        "protocol": "grpc",
+        "rpc": "demo.v1.Greeter/StreamHellos",
+        "mode": "load",
+        "total_requests": 60,
+        "concurrency": 6,
+        "random_data": {"seed": 5},
+        "corpus": {"size": 10}
+    })
+    assert rv.status_code == 200
+    data = rv.get_json()
+    assert data['request']['corpus']['payloads'] == 10
+    assert data['load']['status_counts'] == {'OK': 60}
+    assert data['load']['errors']['total'] == 0
+    assert data['load']['channels']['channels'] >= 1
+    assert greeter_server.calls['demo.v1.Greeter.StreamHellos'] == 60
+    
+    greeter_server.delay = 0.2
+    rv = client.post('/test_api', json={
+        "api_url": greeter_server.target, "protocol": "grpc", "rpc": "Greeter/SayHello",
+        "mode": "load", "total_requests": 4, "concurrency": 4, "timeout": 0.05
+    })
+    load = rv.get_json()['load']
+    assert load['status_counts'] == {'DEADLINE_EXCEEDED': 4}
+    assert load['errors']['total'] == 4
+
+def test_test_api_grpc_load_mode_with_imported_input_type(client):
+    if not (protobuf_with_test_data.grpc_client.available()
+            and protobuf_with_test_data.proto_compiler.in_process_available()):
+        pytest.skip('grpcio / grpcio-tools not installed')
+    from grpc_stub import StubServer
+    import proto_compiler
+    with tempfile.TemporaryDirectory() as proto_dir:
+        with open(os.path.join(proto_dir, 'pinger.proto'), 'w') as f:
+            f.write('syntax = "proto3";\npackage demo.v1;\nimport "google/protobuf/empty.proto";\n'
+                    'service Pinger { rpc Ping(google.protobuf.Empty) returns (google.protobuf.Empty); }\n')
+        descriptor_set, error = proto_compiler.compile_to_descriptor_set(
+            os.path.join(proto_dir, 'pinger.proto'), [proto_dir])
+    assert error is None
+    module = proto_compiler.build_module(descriptor_set, 'pinger.proto')
+    registry = protobuf_with_test_data.protobuf_service.ensure_registry()
+    registry.register_module('pinger.proto', module)
+    try:
+        with StubServer([module.DESCRIPTOR.services_by_name['Pinger']]) as server:
+            payload = {"api_url": server.target, "protocol": "grpc", "rpc": "Pinger/Ping"}
+            single = client.post('/test_api', json=payload)
+            load = client.post('/test_api', json=dict(payload, mode="load", total_requests=10, concurrency=2))
+    finally:
+        registry.unregister('pinger.proto')
+    assert single.status_code == 200
+    assert load.status_code == 200, load.get_json()
+    assert load.get_json()['load']['status_counts'] == {'OK': 10}
+
+@pytest.mark.parametrize('in_process', [True, False])
+def test_compile_cache_skips_repeat_compiles(tmp_path, in_process):
+    from compile_cache import CompileCache
+    service = ProtobufService(compile_cache=CompileCache(str(tmp_path / 'cache')))
+    if in_process and not service.use_in_process_compiler:
+        pytest.skip("grpcio-tools not installed")
+    if not in_process and shutil.which('protoc') is None:
+        pytest.skip("protoc not installed")
+    service.use_in_process_compiler = in_process
+    proto_path = tmp_path / 'cached.proto'
+    proto_path.write_text('syntax = "proto3";\nmessage Ping { string id = 1; }\n')
+    
+    with mock.patch.dict(app.config, {'PROTO_FOLDER': str(tmp_path)}):
+        assert service.compile_proto(str(proto_path))[0]
+        first = service.compile_info['cached.proto']['compiler']
+        assert service.compile_proto(str(proto_path))[0]
+        assert service.compile_info['cached.proto']['compiler'] == 'cache'
+        
+        proto_path.write_text('syntax = "proto3";\nmessage Ping { string id = 1; int32 n = 2; }\n')
+        assert service.compile_proto(str(proto_path))[0]
+        assert service.compile_info['cached.proto']['compiler'] == first
+    assert first == ('in_process' if in_process else 'protoc')
+    assert service.compile_cache.stats()['entries'] == 2
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    """A fresh ProtobufService over an empty upload folder"""
+    upload_folder = tmp_path / 'uploads'
+    upload_folder.mkdir()
+    with mock.patch.dict(app.config, {'UPLOAD_FOLDER': str(upload_folder)}), \
+         mock.patch.object(protobuf_with_test_data, 'protobuf_service', ProtobufService()):
+        yield upload_folder
+
+def zip_upload(files):
+    import zipfile
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    buffer.seek(0)
+    return buffer
+
+BUNDLE = {
+    'protos/common/id.proto': 'syntax = "proto3";\npackage common;\nmessage Id { string value = 1; }\n',
+    'protos/shop/order.proto': 'syntax = "proto3";\npackage shop;\nimport "common/id.proto";\n'
+                               'import "google/protobuf/timestamp.proto";\n'
+                               'message Order { common.Id id = 1; google.protobuf.Timestamp at = 2; }\n'
+                               'service Orders { rpc Get(common.Id) returns (Order); }\n',
+    'protos/shop/cart.proto': 'syntax = "proto3";\npackage shop;\nimport "shop/order.proto";\n'
+                              'message Cart { repeated Order orders = 1; }\n',
+    'protos/billing.proto': 'syntax = "proto3";\nmessage Invoice { string number = 1; }\n',
+}
+
+def test_upload_proto_bundle_compiles_in_dependency_order(client, upload_dir):
+    rv = client.post('/upload_proto', data={'proto_file': (zip_upload(BUNDLE), 'protos.zip'), 'root': 'protos'},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 200, rv.get_json()
+    data = rv.get_json()
+    assert data['files'] == ['billing.proto', 'common/id.proto', 'shop/cart.proto', 'shop/order.proto']
+    order = data['compiled']
+    assert order.index('common/id.proto') < order.index('shop/order.proto') < order.index('shop/cart.proto')
+    assert 'shop.Cart' in data['available_message_types']
+    assert data['available_rpcs'] == ['shop.Orders/Get']
+    assert (upload_dir / 'shop' / 'cart.proto').exists()
+    # One compiler run for the whole bundle
+    assert protobuf_with_test_data.protobuf_service.compile_latency_stats()['in_process']['count'] == 1
+    
+    cart_class, error = protobuf_with_test_data.protobuf_service.find_message_class('shop.Cart')
+    assert error is None
+    cart = cart_class()
+    cart.orders.add().id.value = 'o-1'
+    assert cart_class.FromString(cart.SerializeToString()).orders[0].id.value == 'o-1'
+
+def test_upload_proto_bundle_recompiles_only_changed_files_and_dependents(client, upload_dir):
+    client.post('/upload_proto', data={'proto_file': (zip_upload(BUNDLE), 'protos.zip'), 'root': 'protos'},
+                content_type='multipart/form-data')
+    changed = dict(BUNDLE)
+    changed['protos/shop/order.proto'] = changed['protos/shop/order.proto'].replace(
+        'message Order {', 'message Order { string note = 3;')
+    rv = client.post('/upload_proto', data={'proto_file': (zip_upload(changed), 'protos.zip'), 'root': 'protos'},
+                     content_type='multipart/form-data')
+    data = rv.get_json()
+    assert data['changed'] == ['shop/order.proto']
+    assert data['compiled'] == ['shop/order.proto', 'shop/cart.proto']
+    
+    order_class, _ = protobuf_with_test_data.protobuf_service.find_message_class('shop.Order')
+    assert 'note' in order_class.DESCRIPTOR.fields_by_name
+    
+    # Uploading one imported file on its own also rebuilds the files on disk importing it
+    only_id = {'protos/common/id.proto': BUNDLE['protos/common/id.proto'].replace('string value', 'int64 value')}
+    rv = client.post('/upload_proto', data={'proto_file': (zip_upload(only_id), 'id.zip'), 'root': 'protos'},
+                     content_type='multipart/form-data')
+    assert rv.get_json()['compiled'] == ['common/id.proto', 'shop/order.proto', 'shop/cart.proto']
+
+def test_upload_proto_bundle_rejects_cycles_and_restores_on_compile_error(client, upload_dir):
+    client.post('/upload_proto', data={'proto_file': (zip_upload(BUNDLE), 'protos.zip'), 'root': 'protos'},
+                content_type='multipart/form-data')
+    
+    cyclic = {'a.proto': 'syntax = "proto3";\nimport "b.proto";\n', 'b.proto': 'syntax = "proto3";\nimport "a.proto";\n'}
+    rv = client.post('/upload_proto', data={'proto_file': (zip_upload(cyclic), 'cycle.zip')},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 400
+    assert 'Import cycle' in rv.get_json()['error']
+    assert not (upload_dir / 'a.proto').exists()
+    
+    version = protobuf_with_test_data.protobuf_service._uploads_version()
+    broken = {'protos/common/id.proto': 'syntax = "proto3";\npackage common;\nmessage Id { strin value = 1; }\n'}
+    rv = client.post('/upload_proto', data={'proto_file': (zip_upload(broken), 'broken.zip'), 'root': 'protos'},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 400
+    assert (upload_dir / 'common' / 'id.proto').read_text() == BUNDLE['protos/common/id.proto']
+    # Nothing changed on disk, so other workers are not told to rescan
+    assert protobuf_with_test_data.protobuf_service._uploads_version() == version is not None
+
+def test_upload_reaches_every_process_registry(client, upload_dir):
+    # Another gunicorn worker: same upload folder, its own registry and compiled modules
+    other = ProtobufService()
+    other.ensure_registry()
+    
+    rv = client.post('/upload_proto', data={'proto_file': (zip_upload(BUNDLE), 'protos.zip'), 'root': 'protos'},
+                     content_type='multipart/form-data')
+    assert rv.status_code == 200
+    cart_class, error = other.find_message_class('shop.Cart')
+    assert error is None and cart_class.DESCRIPTOR.full_name == 'shop.Cart'
+    
+    changed = dict(BUNDLE)
+    changed['protos/shop/order.proto'] = changed['protos/shop/order.proto'].replace(
+        'message Order {', 'message Order { string note = 3;')
+    client.post('/upload_proto', data={'proto_file': (zip_upload(changed), 'protos.zip'), 'root': 'protos'},
+                content_type='multipart/form-data')
+    order_class, _ = other.find_message_class('shop.Order')
+    assert 'note' in order_class.DESCRIPTOR.fields_by_name
+    
+    # Re-uploading what is already on disk through a worker that never loaded it still compiles it
+    stale = ProtobufService()
+    stale._registry_loaded = True
+    stale._registry_version = stale._uploads_version()
+    with mock.patch.object(protobuf_with_test_data, 'protobuf_service', stale):
+        rv = client.post('/upload_proto', data={'proto_file': (zip_upload(changed), 'protos.zip'), 'root': 'protos'},
+                         content_type='multipart/form-data')
+    data = rv.get_json()
+    assert data['changed'] == ['billing.proto', 'common/id.proto', 'shop/cart.proto', 'shop/order.proto']
+    assert stale.find_message_class('shop.Cart')[1] is None
+
+def test_metrics_endpoint_reports_routes_compiles_and_outbound_calls(client):
+    def metric_value(text, sample):
+        line = next((line for line in text.splitlines() if line.startswith(sample + ' ')), None)
+        return float(line.split()[-1]) if line else 0.0
+    
+    before = client.get('/metrics').get_data(as_text=True)
+    client.get('/api/users')
+    client.get('/jobs/missing')
+    with mock.patch.object(http_client, 'request') as mock_post:
+        mock_resp = mock.Mock(status_code=201, headers={'content-type': 'application/json'})
+        mock_resp.json.return_value = {'id': 'user_1'}
+        mock_post.return_value = mock_resp
+        client.post('/test_api', json={
+            'api_url': 'http://localhost:8080/api/users',
+            'message_type': 'UserRequest',
+            'protocol': 'rest',
+            # Unique, so the custom_data template cache cannot skip the parse
+            'custom_data': json.dumps({'name': f'Bob {time.time()}'}),
+        })
+    
+    rv = client.get('/metrics')
+    assert rv.status_code == 200
+    assert rv.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    text = rv.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    for sample in ('http_requests_total{method="GET",route="/api/users",status="200"}',
+                   'http_requests_total{method="GET",route="/jobs/<job_id>",status="404"}',
+                   'outbound_requests_total{protocol="http",status="201"}',
+                   'protobuf_json_duration_seconds_count{operation="parse"}',
+                   'protobuf_json_duration_seconds_count{operation="to_json"}'):
+        assert metric_value(text, sample) == metric_value(before, sample) + 1, sample
+    assert metric_value(text, 'http_requests_in_flight') == 1
+    assert 'proto_compile_duration_seconds_count{compiler=' in text
+
+@pytest.fixture
+def profile_store(tmp_path):
+    store = protobuf_with_test_data.profiling.ProfileStore(str(tmp_path / 'profiles'))
+    with mock.patch.object(protobuf_with_test_data, 'profile_store', store), \
+         mock.patch.dict(app.config, {'PROFILING_ENABLED': True}):
+        yield store
+
+def test_request_profile_is_stored_and_linked_from_headers(client, profile_store):
+    rv = client.get('/api/users')
+    assert 'X-Profile-Id' not in rv.headers
+    
+    rv = client.get('/api/users?profile=cprofile')
+    assert rv.status_code == 200
+    location = rv.headers['X-Profile-Location']
+    assert location == f"/profiles/{rv.headers['X-Profile-Id']}"
+    report = client.get(location + '?sort=tottime&limit=20').get_data(as_text=True)
+    assert 'function calls' in report
+    assert 'list_records' in client.get(location).get_data(as_text=True)
+    raw = client.get(location + '?format=raw')
+    assert raw.mimetype == 'application/octet-stream'
+    
+    rv = client.post('/test_api', json={'api_url': 'http://localhost', 'message_type': 'Missing'},
+                     headers={'X-Profile': 'sample'})
+    sampled = client.get(rv.headers['X-Profile-Location'])
+    assert sampled.mimetype == 'text/plain'
+    
+    listed = client.get('/profiles').get_json()['profiles']
+    assert [(profile['kind'], profile['path']) for profile in listed] == [
+        ('sample', '/test_api'), ('cprofile', '/api/users?profile=cprofile')]
+    assert client.get('/api/users?profile=perf').status_code == 400
+    assert client.get('/profiles/0123abcd').status_code == 404
+
+def test_sampling_profile_endpoint_runs_in_background(client, profile_store):
+    assert client.post('/profiles/sample?seconds=0').status_code == 400
+    rv = client.post('/profiles/sample', json={'seconds': 0.2, 'interval_ms': 2})
+    assert rv.status_code == 202
+    location = rv.get_json()['location']
+    assert client.get(location).get_json()['status'] == 'running'
+    assert client.post('/profiles/sample', json={'seconds': 1}).status_code == 409
+    
+    deadline = time.time() + 5
+    while client.get(location).status_code == 202 and time.time() < deadline:
+        time.sleep(0.02)
+    collapsed = client.get(location).get_data(as_text=True)
+    assert '\nMainThread;' in '\n' + collapsed
+    
+    with mock.patch.dict(app.config, {'PROFILING_ENABLED': False}):
+        assert client.post('/profiles/sample').status_code == 403
+        assert 'X-Profile-Id' not in client.get('/api/users?profile=1').headers
+
+def test_profiling_is_off_by_default():
+    assert app.config['PROFILING_ENABLED'] is False
+
+def test_streamed_response_profile_covers_the_body(client, profile_store):
+    for i in range(3):
+        client.post('/api/users', json={'name': f'user{i}'})
+    rv = client.get('/api/users?format=ndjson&profile=cprofile')
+    location = rv.headers['X-Profile-Location']
+    assert client.get(location).status_code == 202
+    assert len(rv.get_data(as_text=True).splitlines()) == 3
+    rv.close()
+    report = client.get(location + '?limit=200').get_data(as_text=True)
+    assert '(generate)' in report
+
+def test_test_api_reuses_parsed_custom_data(client):
+    payload = {
+        "api_url": "http://localhost:8080/api/users",
+        "message_type": "UserRequest",
+        "protocol": "protobuf",
+        "custom_data": json.dumps({"name": f"Cached {time.time()}", "tags": ["a", "b"]})
+    }
+    before = client.get('/cache_stats').get_json()['custom_data_templates']
+    with mock.patch.object(http_client, 'request') as mock_post:
+        mock_post.return_value = mock.Mock(status_code=201, headers={'content-type': 'text/plain'}, text='ok')
+        first = client.post('/test_api', json=payload).get_json()
+        second = client.post('/test_api', json=payload).get_json()
+        sent = [call.kwargs['data'] for call in mock_post.call_args_list]
+    
+    assert first['request']['custom_data_cached'] is False
+    assert second['request']['custom_data_cached'] is True
+    assert sent[0] == sent[1] and sent[0]
+    assert second['request']['test_data_used'] == first['request']['test_data_used']
+    after = client.get('/cache_stats').get_json()['custom_data_templates']
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 1)
+
+def test_warm_up_compiles_and_plans_every_uploaded_type():
+    service = protobuf_with_test_data.protobuf_service
+    summary = protobuf_with_test_data.warm_up()
+    assert summary['proto_files'] >= 1 and summary['message_types'] >= 6
+    
+    user_request, _ = service.ensure_registry().resolve('sample.proto:UserRequest')
+    assert user_request in service.data_generator._plans
@@ -0,0 +1,116 @@
+"""Thread-safe in-memory record store backing the sample /api endpoints"""
+import itertools
+import threading
+
+
+class _Shard:
+    __slots__ = ('records', 'lock', 'max_number')
+
+    def __init__(self):
+        # id number -> record
+        self.records = {}
+        self.lock = threading.Lock()
+        self.max_number = 0
+
+
+class SampleStore:
+    """Records keyed ``<prefix>_<n>`` with atomic ids and lock striping.
+
+    Ids come from ``itertools.count``, whose ``next()`` runs entirely in C
+    under the GIL, so concurrent creators never receive the same id. Record
+    ``n`` lives in shard ``n % shards``, each shard guarded by its own lock,
+    so writers only contend when they land on the same shard. Because ids
+    are dense, a page after a given id is read with one lookup per id
+    instead of sorting the whole store.
+    """
+
+    def __init__(self, prefix, shards=16):
+        self.prefix = prefix
+        self._ids = itertools.count(1)
+        self._shards = [_Shard() for _ in range(shards)]
+        # Highest id removed by clear(); pages never need to scan below it
+        self._floor = 0
+
+    def _number(self, key):
+        prefix, _, number = key.rpartition('_')
+        if prefix != self.prefix or not number.isdigit():
+            raise KeyError(key)
+        return int(number)
+
+    def valid_key(self, key):
+        try:
+            self._number(key)
+        except KeyError:
+            return False
+        return True
+
+    def _shard(self, number):
+        return self._shards[number % len(self._shards)]
+
+    def allocate_id(self):
+        return f'{self.prefix}_{next(self._ids)}'
+
+    def put(self, key, record):
+        number = self._number(key)
+        shard = self._shard(number)
+        with shard.lock:
+            shard.records[number] = record
+            if number > shard.max_number:
+                shard.max_number = number
+
+    def add(self, record):
+        """Store a record under a freshly allocated id and return the id"""
+        key = self.allocate_id()
+        self.put(key, record)
+        return key
+
+    def get(self, key):
+        try:
+            number = self._number(key)
+        except KeyError:
+            return None
+        shard = self._shard(number)
+        with shard.lock:
+            return shard.records.get(number)
+
+    def clear(self):
+        self._floor = max(self._floor, max(shard.max_number for shard in self._shards))
+        for shard in self._shards:
+            with shard.lock:
+                shard.records.clear()
+                shard.max_number = 0
+
+    def __len__(self):
+        return sum(len(shard.records) for shard in self._shards)
+
+    def page(self, after=None, limit=100):
+        """Up to ``limit`` (key, record) pairs with ids after the key ``after``.
+
+        Returns (items, next_cursor); next_cursor is None once the end of
+        the store was reached.
+        """
+        number = max(self._number(after) if after else 0, self._floor)
+        highest = max(shard.max_number for shard in self._shards)
+        items = []
+        while number < highest and len(items) < limit:
+            number += 1
+            shard = self._shard(number)
+            with shard.lock:
+                record = shard.records.get(number)
+            if record is not None:
+                items.append((f'{self.prefix}_{number}', record))
+        next_cursor = items[-1][0] if items and number < highest else None
+        return items, next_cursor
+
+    def iter_from(self, after=None, batch_size=1000):
+        """Yield (key, record) pairs in id order, one page at a time"""
+        cursor = after
+        while True:
+            items, cursor = self.page(cursor, batch_size)
+            yield from items
+            if cursor is None:
+                return
+
+    def to_dict(self):
+        """Snapshot of all records, ordered by id"""
+        return dict(self.iter_from())
@@ -0,0 +1,50 @@
+import threading
+from sample_store import SampleStore
+
+
+def test_concurrent_adds_get_unique_ids():
+    store = SampleStore('user')
+    ids = []
+    ids_lock = threading.Lock()
+
+    def writer():
+        created = [store.add({'n': i}) for i in range(500)]
+        with ids_lock:
+            ids.extend(created)
+
+    threads = [threading.Thread(target=writer) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ids) == len(set(ids)) == 8000
+    assert len(store) == 8000
+
+
+def test_to_dict_is_ordered_by_id_and_clear_empties_all_shards():
+    store = SampleStore('prod', shards=4)
+    for i in range(12):
+        store.add({'i': i})
+    assert list(store.to_dict()) == [f'prod_{i}' for i in range(1, 13)]
+    assert store.get('prod_3') == {'i': 2}
+
+    store.clear()
+    assert store.to_dict() == {}
+    # Ids keep increasing after clear
+    assert store.add({}) == 'prod_13'
+
+
+def test_page_follows_cursor_and_skips_missing_ids():
+    store = SampleStore('user', shards=3)
+    for i in range(5):
+        store.add({'i': i})
+    store.put('user_9', {'i': 9})
+
+    items, cursor = store.page(limit=4)
+    assert [key for key, _ in items] == ['user_1', 'user_2', 'user_3', 'user_4']
+    items, cursor = store.page(cursor, limit=4)
+    assert [key for key, _ in items] == ['user_5', 'user_9']
+    assert cursor is None
+    assert [key for key, _ in store.iter_from('user_3', batch_size=1)] == ['user_4', 'user_5', 'user_9']
+    assert not store.valid_key('prod_1')
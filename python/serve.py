@@ -0,0 +1,111 @@
+"""Production launcher: gunicorn workers forked from a warmed-up master, or a plain threaded server.
+
+Run from the python/ directory:
+
+    python serve.py [--mode gunicorn|threaded|dev] [--port 8080] [--workers N] [--threads 4]
+
+Every option can also be set through the environment (HOST, PORT,
+WEB_CONCURRENCY, THREADS, TIMEOUT, SERVE_MODE, SERVE_APP); flags win.
+"""
+import argparse
+import importlib
+import os
+import sys
+from process_load import available_cpus
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+MODES = ('gunicorn', 'threaded', 'dev')
+DEFAULT_APP = 'protobuf_with_test_data:app'
+DEFAULT_THREADS = 4
+# Seconds a worker may stay silent before gunicorn restarts it; load-mode requests run long
+DEFAULT_TIMEOUT = 120
+
+
+def available():
+    return BaseApplication is not None
+
+
+if BaseApplication is not None:
+    class PreloadedApplication(BaseApplication):
+        """Serves an app imported (and warmed up) in the gunicorn master, so workers fork with it loaded"""
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def parse_args(argv=None, environ=os.environ):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=MODES,
+                        default=environ.get('SERVE_MODE', 'gunicorn' if available() else 'threaded'),
+                        help='gunicorn: pre-fork workers (default when installed); threaded: one Werkzeug '
+                             'process without debugger; dev: Werkzeug with debugger and reloader')
+    parser.add_argument('--host', default=environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(environ.get('PORT', 8080)))
+    parser.add_argument('--workers', type=int, default=int(environ.get('WEB_CONCURRENCY', len(available_cpus()))),
+                        help='gunicorn worker processes (default: one per CPU)')
+    parser.add_argument('--threads', type=int, default=int(environ.get('THREADS', DEFAULT_THREADS)),
+                        help='request threads per gunicorn worker')
+    parser.add_argument('--timeout', type=int, default=int(environ.get('TIMEOUT', DEFAULT_TIMEOUT)))
+    parser.add_argument('--app', default=environ.get('SERVE_APP', DEFAULT_APP), help='module:attribute of the app')
+    parser.add_argument('--no-warm-up', dest='warm_up', action='store_false',
+                        help="skip the app module's warm_up() before serving")
+    args = parser.parse_args(argv)
+    if args.mode == 'gunicorn' and not available():
+        parser.error('gunicorn is not installed (pip install gunicorn); use --mode threaded')
+    if args.workers < 1 or args.threads < 1:
+        parser.error('--workers and --threads must be at least 1')
+    return args
+
+
+def gunicorn_options(args):
+    return {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        # The app is already imported; workers inherit compiled modules, registry and plans.
+        # Later uploads reach each worker through the uploads version file
+        'preload_app': True,
+    }
+
+
+def load_app(spec):
+    """(module, app) for ``module:attribute``"""
+    module_name, _, attribute = spec.partition(':')
+    module = importlib.import_module(module_name)
+    return module, getattr(module, attribute or 'app')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    module, app = load_app(args.app)
+    if args.mode == 'dev':
+        if args.warm_up and hasattr(module, 'warm_up'):
+            module.warm_up()
+        app.run(debug=True, host=args.host, port=args.port)
+        return
+
+    if args.warm_up and hasattr(module, 'warm_up'):
+        print(f'Warmed up: {module.warm_up()}', file=sys.stderr)
+    if args.mode == 'gunicorn':
+        PreloadedApplication(app, gunicorn_options(args)).run()
+    else:
+        app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
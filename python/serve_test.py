@@ -0,0 +1,75 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import pytest
+import requests
+import serve
+
+
+def test_flags_override_environment():
+    environ = {'SERVE_MODE': 'threaded', 'PORT': '9000', 'WEB_CONCURRENCY': '3', 'THREADS': '2', 'TIMEOUT': '30'}
+    args = serve.parse_args([], environ)
+    assert (args.mode, args.port, args.workers, args.threads, args.timeout) == ('threaded', 9000, 3, 2, 30)
+
+    args = serve.parse_args(['--port', '9100', '--workers', '5', '--no-warm-up'], environ)
+    assert (args.port, args.workers, args.warm_up) == (9100, 5, False)
+
+
+def test_rejects_zero_workers():
+    with pytest.raises(SystemExit):
+        serve.parse_args(['--mode', 'threaded', '--workers', '0'], {})
+
+
+def test_gunicorn_options_preload_gthread_workers():
+    args = serve.parse_args(['--mode', 'threaded', '--host', '127.0.0.1', '--port', '8081', '--workers', '2'], {})
+    options = serve.gunicorn_options(args)
+    assert options['bind'] == '127.0.0.1:8081'
+    assert options['workers'] == 2 and options['threads'] == serve.DEFAULT_THREADS
+    assert options['worker_class'] == 'gthread' and options['preload_app']
+
+
+def test_preloaded_application_serves_the_given_app():
+    pytest.importorskip('gunicorn')
+    module, app = serve.load_app(serve.DEFAULT_APP)
+    assert module.app is app
+
+    args = serve.parse_args(['--mode', 'gunicorn', '--workers', '3', '--threads', '2'], {})
+    application = serve.PreloadedApplication(app, serve.gunicorn_options(args))
+    assert application.load() is app
+    assert (application.cfg.workers, application.cfg.threads, application.cfg.preload_app) == (3, 2, True)
+
+
+def test_upload_is_visible_in_every_gunicorn_worker(tmp_path):
+    pytest.importorskip('gunicorn')
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(serve.__file__), '--mode', 'gunicorn', '--host', '127.0.0.1',
+         '--port', str(port), '--workers', '2', '--threads', '1'],
+        cwd=tmp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                requests.get(f'{base_url}/api/users', timeout=1)
+                break
+            except requests.ConnectionError:
+                assert server.poll() is None and time.monotonic() < deadline, 'server did not start'
+                time.sleep(0.2)
+
+        proto = b'syntax = "proto3";\npackage fork;\nmessage ForkProbe { string id = 1; }\n'
+        rv = requests.post(f'{base_url}/upload_proto', files={'proto_file': ('forkprobe.proto', proto)}, timeout=30)
+        assert rv.status_code == 200, rv.text
+
+        statuses = [requests.post(f'{base_url}/generate_test_data/ForkProbe', timeout=30).status_code
+                    for _ in range(30)]
+        assert statuses == [200] * 30
+    finally:
+        # SIGQUIT: gunicorn's quick shutdown; SIGTERM waits out the graceful timeout
+        server.send_signal(signal.SIGQUIT)
+        server.wait(timeout=30)
@@ -0,0 +1,110 @@
+"""Parsed custom_data templates, so identical JSON strings are parsed into messages once"""
+import json
+import threading
+from collections import OrderedDict
+from google.protobuf.json_format import ParseDict
+
+
+class Template:
+    """One parsed message, never modified, and its memoized encodings"""
+
+    def __init__(self, message, on_encoded=None):
+        self.message = message
+        self._encodings = {}
+        # Called with (template, size) for each new memoized encoding
+        self._on_encoded = on_encoded
+
+    def copy(self):
+        """A fresh message equal to the template, free for the caller to modify"""
+        message = type(self.message)()
+        message.CopyFrom(self.message)
+        return message
+
+    def encoded(self, name, encode):
+        """``encode(message)``, computed once per ``name``"""
+        value = self._encodings.get(name)
+        if value is None:
+            # Racing threads compute equal values; either may win
+            encoded = encode(self.message)
+            value = self._encodings.setdefault(name, encoded)
+            if value is encoded and self._on_encoded is not None:
+                self._on_encoded(self, len(value))
+        return value
+
+
+class TemplateCache:
+    """LRU of templates keyed by (message class, custom_data string).
+
+    Bounded by entry count and by total bytes: each entry counts its source
+    string, the serialized size of the parsed message and every encoding
+    memoized on it since. Classes are part of the key, so recompiling a
+    .proto file makes new entries while the old ones age out.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        # template -> bytes it is counted for
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, message_class, custom_data):
+        """(template, cached) for a custom_data JSON string; raises what json.loads / ParseDict raise"""
+        key = (message_class, custom_data)
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return template, True
+            self.misses += 1
+
+        # Parsed outside the lock; a concurrent miss on the same key parses it twice
+        template = Template(ParseDict(json.loads(custom_data), message_class()), self._encoded)
+        size = len(custom_data) + template.message.ByteSize()
+        if size > self.max_bytes:
+            return template, False
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = template
+                self._sizes[template] = size
+                self._bytes += size
+                self._evict()
+        return template, False
+
+    def _encoded(self, template, size):
+        with self._lock:
+            # Templates that were never stored, or already evicted, are not counted
+            if template in self._sizes:
+                self._sizes[template] += size
+                self._bytes += size
+                self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, template = self._entries.popitem(last=False)
+            self._bytes -= self._sizes.pop(template)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
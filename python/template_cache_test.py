@@ -0,0 +1,67 @@
+import json
+import pytest
+from google.protobuf import descriptor_pb2
+from google.protobuf.json_format import ParseError
+from template_cache import TemplateCache
+
+# A compiled message class that needs no uploaded proto
+FileOptions = descriptor_pb2.FileOptions
+
+
+def test_hits_return_independent_copies_and_memoized_encodings():
+    cache = TemplateCache()
+    custom_data = json.dumps({'javaPackage': 'demo', 'optimizeFor': 'SPEED'})
+    template, cached = cache.get(FileOptions, custom_data)
+    assert not cached
+    again, cached = cache.get(FileOptions, custom_data)
+    assert cached and again is template
+
+    copy = again.copy()
+    copy.java_package = 'changed'
+    assert template.message.java_package == 'demo'
+    encodings = []
+    for _ in range(2):
+        encodings.append(template.encoded('protobuf', lambda message: message.SerializeToString()))
+    assert encodings[0] is encodings[1]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_invalid_custom_data_raises_and_is_not_cached():
+    cache = TemplateCache()
+    with pytest.raises(ValueError):
+        cache.get(FileOptions, '{"javaPackage": ')
+    with pytest.raises(ParseError):
+        cache.get(FileOptions, '{"noSuchField": 1}')
+    assert cache.stats()['entries'] == 0
+
+
+def test_evicts_least_recently_used_by_count_and_size():
+    cache = TemplateCache(max_entries=2, max_bytes=200)
+    first = json.dumps({'javaPackage': 'a'})
+    cache.get(FileOptions, first)
+    cache.get(FileOptions, json.dumps({'javaPackage': 'b'}))
+    cache.get(FileOptions, first)
+    cache.get(FileOptions, json.dumps({'javaPackage': 'c'}))
+    assert cache.get(FileOptions, first)[1]
+    assert cache.stats()['evictions'] == 1
+
+    # Larger than the whole cache: parsed but never stored
+    _, cached = cache.get(FileOptions, json.dumps({'javaPackage': 'x' * 200}))
+    assert not cached and cache.stats()['entries'] == 2
+    cache.get(FileOptions, json.dumps({'javaPackage': 'y' * 80}))
+    assert cache.stats()['entries'] == 1 and cache.stats()['bytes'] <= 200
+
+
+def test_memoized_encodings_count_towards_the_byte_cap():
+    cache = TemplateCache(max_bytes=400)
+    first, _ = cache.get(FileOptions, json.dumps({'javaPackage': 'a' * 20}))
+    stored = cache.stats()['bytes']
+    assert stored > len(json.dumps({'javaPackage': 'a' * 20}))
+    first.encoded('display', lambda message: b'x' * 100)
+    assert cache.stats()['bytes'] == stored + 100
+
+    # Growing past the cap evicts the least recently used entry
+    second, _ = cache.get(FileOptions, json.dumps({'javaPackage': 'b' * 20}))
+    second.encoded('display', lambda message: b'x' * 250)
+    assert cache.stats()['entries'] == 1 and cache.stats()['bytes'] <= 400
+    assert not cache.get(FileOptions, json.dumps({'javaPackage': 'a' * 20}))[1]